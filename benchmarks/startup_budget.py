@@ -0,0 +1,70 @@
+import argparse
+import os
+import re
+import subprocess
+import sys
+from statistics import median
+from typing import Dict, List, Tuple
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+ENTRY_MODULE = 'satb_solver.satb'
+# Only needed by some settings or once something is printed, never at start-up
+DEFERRED_MODULES = ['yaml', 'termcolor', 'numpy', 'multiprocessing', 'concurrent.futures',
+                    'hashlib', 'logging']
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description='Check the import time of the solver against a budget, using -X importtime'
+    )
+    # Leaves room for slower and busier machines; DEFERRED_MODULES catches regressions
+    #  that a loose budget would not
+    parser.add_argument('--budget-ms', type=float, default=250,
+                        help='Maximum median cumulative import time of {}'.format(ENTRY_MODULE))
+    parser.add_argument('--runs', type=int, default=5,
+                        help='Number of fresh interpreters to measure')
+    parser.add_argument('--top', type=int, default=10,
+                        help='Number of slowest modules to report')
+    return parser.parse_args()
+
+
+def measure_imports() -> Dict[str, Tuple[int, int]]:
+    # Modules by name, with their own and cumulative import time in microseconds
+    proc = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', 'import {}'.format(ENTRY_MODULE)],
+        cwd=REPO_DIR, stderr=subprocess.PIPE, stdout=subprocess.DEVNULL, text=True, check=True
+    )
+    imports = {}
+    for line in proc.stderr.splitlines():
+        match = re.match(r'^import time:\s+(\d+) \|\s+(\d+) \|\s+(.*)$', line)
+        if match is not None:
+            imports[match.group(3).strip()] = (int(match.group(1)), int(match.group(2)))
+    return imports
+
+
+def report(runs: List[Dict[str, Tuple[int, int]]], top: int) -> float:
+    totals = [imports[ENTRY_MODULE][1] / 1000 for imports in runs]
+    print('Cumulative import time of {}: median {:.1f} ms over {} runs'.format(
+        ENTRY_MODULE, median(totals), len(totals)
+    ))
+    print('Slowest modules (own time, last run):')
+    for name, (own, _) in sorted(runs[-1].items(), key=lambda item: -item[1][0])[:top]:
+        print('  {:>8.1f} ms  {}'.format(own / 1000, name))
+    return median(totals)
+
+
+if __name__ == '__main__':
+    args = parse_args()
+    runs = [measure_imports() for _ in range(args.runs)]
+    total_ms = report(runs, args.top)
+
+    failures = []
+    eager = [name for name in DEFERRED_MODULES if name in runs[-1]]
+    if eager:
+        failures.append('Imported at start-up: {}'.format(', '.join(eager)))
+    if total_ms > args.budget_ms:
+        failures.append('{:.1f} ms exceeds the budget of {:.1f} ms'.format(total_ms,
+                                                                          args.budget_ms))
+    for failure in failures:
+        print('FAIL: {}'.format(failure))
+    sys.exit(1 if failures else 0)
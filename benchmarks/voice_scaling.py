@@ -0,0 +1,84 @@
+import argparse
+import os
+import sys
+from statistics import median
+from time import perf_counter
+from typing import List, Optional
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from model.exceptions import UnableToTransitionError  # noqa: E402
+from model.solver_config import config_overrides  # noqa: E402
+from satb_solver.chord_transitioner import ChordTransitioner  # noqa: E402
+from satb_solver.template_parser import TemplateParser  # noqa: E402
+
+# An opening voicing of C major for each voice count, lowest voice first
+INIT_CONDS = {
+    4: 'C3 G3 E4 C5',
+    5: 'C3 E3 C4 G4 E5',
+    6: 'C3 E3 G3 C4 E4 C5',
+    7: 'C3 G3 C4 E4 G4 C5 E5',
+    8: 'C3 E3 G3 C4 E4 C5 G5 C6'
+}
+TEMPLATE = ['Cmaj', 'Amin', 'Dmin7', 'G7', 'Cmaj']
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description='Time the search engines on the same progression from 4 to 8 voices'
+    )
+    parser.add_argument('--engines', type=str, nargs='+', default=['bf', 'indexed', 'bnb'],
+                        choices=sorted(ChordTransitioner.ENGINES))
+    parser.add_argument('--voices', type=int, nargs='+', default=sorted(INIT_CONDS),
+                        choices=sorted(INIT_CONDS))
+    parser.add_argument('--runs', type=int, default=3,
+                        help='Number of solves per engine and voice count')
+    parser.add_argument('--max-seconds', type=float, default=60,
+                        help='Skip the larger voice counts of an engine once a solve takes '
+                             'longer than this')
+    return parser.parse_args()
+
+
+def time_solve(engine: str, voice_count: int, runs: int) -> Optional[List[float]]:
+    # Seconds per solve, or None when the progression has no solution
+    with config_overrides(voice_count=voice_count, engine=engine, include_inv=True,
+                          lookahead_depth=0, checkpoint_dir=None, transition_table=None):
+        template_parser = TemplateParser()
+        timings = []
+        for _ in range(runs):
+            chord_transitioner = ChordTransitioner()
+            t0 = perf_counter()
+            try:
+                chord_transitioner.transition_chords(
+                    template_parser.parse_template(TEMPLATE),
+                    template_parser.parse_init_cond(INIT_CONDS[voice_count])
+                )
+            except UnableToTransitionError:
+                return None
+            timings.append(perf_counter() - t0)
+        return timings
+
+
+if __name__ == '__main__':
+    args = parse_args()
+    transitions = len(TEMPLATE) - 1
+    print('{} transitions: {}'.format(transitions, ' '.join(TEMPLATE)))
+    print('{:<10}{:>8}{:>14}{:>18}{:>10}'.format(
+        'Engine', 'Voices', 'Solve (s)', 'Transition (ms)', 'Growth'
+    ))
+    for engine in args.engines:
+        prev = None
+        for voice_count in sorted(args.voices):
+            timings = time_solve(engine, voice_count, args.runs)
+            if timings is None:
+                print('{:<10}{:>8}{:>14}'.format(engine, voice_count, 'unsolvable'))
+                continue
+            solve_time = median(timings)
+            print('{:<10}{:>8}{:>14.3f}{:>18.2f}{:>10}'.format(
+                engine, voice_count, solve_time, 1000 * solve_time / transitions,
+                'x{:.1f}'.format(solve_time / prev) if prev else '-'
+            ))
+            prev = solve_time
+            if solve_time > args.max_seconds and voice_count < max(args.voices):
+                print('{:<10}skipped from {} voices'.format(engine, voice_count + 1))
+                break
@@ -0,0 +1,32 @@
+import argparse
+from time import time
+
+from satb_solver.transition_table import build_transition_table, get_common_vocabulary
+
+ROOTS = ['C', 'Db', 'D', 'Eb', 'E', 'F', 'F#', 'G', 'Ab', 'A', 'Bb', 'B']
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description='Precompute optimal transitions between common chords for the '
+                    'voice count and settings in solver_config.yaml'
+    )
+    parser.add_argument('output', type=str, nargs=1,
+                        help='Path of the transition table file to write')
+    parser.add_argument('--roots', type=str, nargs='+', default=ROOTS,
+                        help='Chord roots of the vocabulary (default: 12 roots)')
+    parser.add_argument('--formulas', type=str, nargs='+', default=None,
+                        help='Explicit chord formulas to use instead of the vocabulary')
+    parser.add_argument('--workers', type=int, default=1,
+                        help='Number of worker processes')
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    args = parse_args()
+    formulas = args.formulas or get_common_vocabulary(args.roots)
+    t0 = time()
+    entry_count = build_transition_table(args.output[0], formulas, args.workers)
+    print('{} transitions between {} formulas written to {} in: {} sec'.format(
+        entry_count, len(formulas), args.output[0], round(time() - t0, 5)
+    ))
@@ -0,0 +1,83 @@
+import argparse
+import os
+import random
+import sys
+from time import time
+
+from model.solver_config import config_overrides, parse_config_overrides
+from satb_solver.differential import DifferentialTester, ProgressionGenerator
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description='Compare a candidate engine or setting against the reference '
+                    'breadth-first engine on random progressions'
+    )
+    parser.add_argument('-c', '--candidate', type=str, action='append', default=[],
+                        metavar='SETTING=VALUE',
+                        help='Setting of the candidate, such as engine=indexed (repeatable)')
+    parser.add_argument('-r', '--reference', type=str, action='append', default=['engine=bf'],
+                        metavar='SETTING=VALUE',
+                        help='Setting of the reference (default: engine=bf, repeatable)')
+    parser.add_argument('-n', '--trials', type=int, default=100,
+                        help='Number of random progressions')
+    parser.add_argument('--seed', type=int, default=0,
+                        help='Seed of the random progressions')
+    parser.add_argument('--voice-counts', type=int, nargs='+', default=[4, 5],
+                        help='Voice counts drawn from for each progression (6 voices and '
+                             'more can take the reference minutes per progression)')
+    parser.add_argument('--min-length', type=int, default=2,
+                        help='Minimum number of chords of a progression')
+    parser.add_argument('--max-length', type=int, default=6,
+                        help='Maximum number of chords of a progression')
+    parser.add_argument('-o', '--out-dir', type=str, default='mismatches',
+                        help='Directory where minimized reproducers are written')
+    parser.add_argument('--replay', type=str, nargs='+', default=None, metavar='REPRODUCER',
+                        help='Run written reproducers again instead of random progressions')
+    return parser.parse_args()
+
+
+def replay(paths) -> int:
+    mismatches = 0
+    for path in paths:
+        tester, init_cond, template, settings = DifferentialTester.read_reproducer(path)
+        ref, cand = tester.compare(init_cond, template, settings)
+        print('{}: {}'.format(path, 'MISMATCH' if ref != cand else 'match'))
+        if ref != cand:
+            mismatches += 1
+            print('  reference: {}'.format(tester.describe(ref)))
+            print('  candidate: {}'.format(tester.describe(cand)))
+    return mismatches
+
+
+if __name__ == '__main__':
+    args = parse_args()
+    if args.replay is not None:
+        sys.exit(1 if replay(args.replay) else 0)
+
+    tester = DifferentialTester(parse_config_overrides(args.reference),
+                                parse_config_overrides(args.candidate))
+    rng = random.Random(args.seed)
+    mismatches, solvable, t0 = 0, 0, time()
+    for trial in range(args.trials):
+        settings = {'voice_count': rng.choice(args.voice_counts),
+                    'include_inv': rng.random() < 0.5}
+        with config_overrides(**settings):
+            generator = ProgressionGenerator(rng, tester.template_parser)
+            init_cond, template = generator.random_progression(args.min_length, args.max_length)
+        ref, cand = tester.compare(init_cond, template, settings)
+        solvable += ref[0] == 'solved'
+        if ref == cand:
+            continue
+        mismatches += 1
+        minimized = tester.minimize(init_cond, template, settings)
+        outcomes = tester.compare(init_cond, minimized, settings)
+        path = os.path.join(args.out_dir, 'mismatch_{}_{}.json'.format(args.seed, trial))
+        tester.write_reproducer(path, init_cond, minimized, settings, outcomes, template)
+        print('Trial {}: {} chords, minimized to {}, written to {}'.format(
+            trial, len(template), ' '.join(minimized), path
+        ))
+    print('{} mismatches in {} progressions, {} of them solvable ({} sec)'.format(
+        mismatches, args.trials, solvable, round(time() - t0, 5)
+    ))
+    sys.exit(1 if mismatches else 0)
@@ -15,6 +15,7 @@ class Chord:
         self.base_ess = self.ESSENTIAL
         self.inversion = inv
         self.itvls = {}
+        self.frozen = False
 
     def __repr__(self):
         return str((self.base_note, self.inversion, self.itvls))
@@ -29,46 +30,82 @@ class Chord:
         return nat_note_name + ACCSYM.incr(ACCSYM.NAT, change)
 
     def get_itvl_note_mapping(self) -> SimpleBiMap:
+        if self.frozen:
+            return self._itvl_note_mapping
         mapping = SimpleBiMap()
         for pos, itvl in self.itvls.items():
             mapping.set(pos, AbstractNote(self._infer_note_name(pos, itvl)))
         return mapping
 
     def get_key_pos_pairs(self) -> Set[NotePosPair]:
+        if self.frozen:
+            return self._key_pos_pairs
         return {NotePosPair(pos, AbstractNote(self._infer_note_name(pos, itvl)))
                 for pos, itvl in self.itvls.items()}
 
     def get_note_freqs(self, exc=False) -> Dict[int, FreqRange]:
+        if self.frozen:
+            # base_ess starts out as the class-wide ESSENTIAL set, which later formulas
+            #  can extend, so the cached tables are keyed by its current contents
+            key = (exc, frozenset(self.base_ess), get_config()['voice_count'])
+            if key not in self._note_freqs:
+                self._note_freqs[key] = self._get_note_freqs(exc)
+            return self._note_freqs[key]
+        return self._get_note_freqs(exc)
+
+    def _get_note_freqs(self, exc: bool) -> Dict[int, FreqRange]:
         freqs = {}
+        # Beyond 6 voices, every note that can be doubled can be doubled once more per
+        #  extra voice, so that seventh and ninth chords remain voiceable
+        extra = max(0, get_config()['voice_count'] - 6)
         for scale_pos in self.itvls.keys():
             freqs[scale_pos] = FreqRange(
                 min_freq=1 if scale_pos in (self.CAD_ESSENTIAL if exc else self.base_ess) else 0,
-                max_freq=1 if scale_pos in self.NON_DUP else (3 if exc else 2)
+                max_freq=1 if scale_pos in self.NON_DUP else (3 if exc else 2) + extra
             )
         return freqs
 
     def annotate(self, formula_name: str) -> None:
+        self._assert_mutable()
         self.formula_name = formula_name
 
+    def _assert_mutable(self) -> None:
+        assert not self.frozen, 'Chord {} is shared and cannot be modified'.format(
+            self.formula_name
+        )
+
+    def freeze(self) -> 'Chord':
+        # Resolved chords are shared between every use of the same formula, so they
+        #  are made read-only and their spelling and frequencies computed once.
+        self._itvl_note_mapping = self.get_itvl_note_mapping()
+        self._key_pos_pairs = frozenset(self.get_key_pos_pairs())
+        self._note_freqs = {}
+        self.frozen = True
+        return self
+
     def note_count(self) -> int:
         return len(self.itvls)
 
     def set_notes(self, *new: Tuple[int, int]) -> None:
+        self._assert_mutable()
         for (place, itv) in new:
             self.itvls[place] = itv
 
     def remove_notes(self, *targets: int) -> None:
+        self._assert_mutable()
         for place in targets:
             if place in self.itvls:
                 del self.itvls[place]
 
     def add_ess_notes(self, target: int) -> None:
+        self._assert_mutable()
         self.base_ess |= {target}
         assert len(self.base_ess) <= get_config()['voice_count'], (
             'Number of essential notes exceeded when requiring note at pos {}'.format(target)
         )
 
     def replace_ess_notes(self, old: int, new: int) -> None:
+        self._assert_mutable()
         self.base_ess = self.base_ess - {old} | {new}
         assert len(self.base_ess) <= get_config()['voice_count'], (
             'Number of essential notes exceeded when replacing note requirement from '
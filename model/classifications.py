@@ -1,9 +1,6 @@
-import logging
 from typing import Tuple
 from model.multimap import OneWayMultiMap
 
-log = logging.getLogger('classifications')
-
 
 class ACCSYM:
     FLFL = 'bb'
@@ -19,7 +16,11 @@ class ACCSYM:
         try:
             return cls.ORDER[new_acc_pos]
         except IndexError:
-            log.error('Attempted adjustment of {} to {}'.format(adj, acc))
+            import logging
+
+            logging.getLogger('classifications').error(
+                'Attempted adjustment of {} to {}'.format(adj, acc)
+            )
             return acc
 
     @classmethod
@@ -44,15 +45,19 @@ class NoteNameToScalePos:
 
 class _NoteNameToSemi(OneWayMultiMap):
     ACCID = {ACCSYM.FLFL: -2, ACCSYM.FL: -1, ACCSYM.NAT: 0, ACCSYM.SH: 1, ACCSYM.SHSH: 2}
+    # Every natural note with every accidental, as NoteNameToScalePos.MAP offset by ACCID
+    MAP = {
+        'Cbb': 10, 'Cb': 11, 'C': 0, 'C#': 1, 'Cx': 2,
+        'Dbb': 0, 'Db': 1, 'D': 2, 'D#': 3, 'Dx': 4,
+        'Ebb': 2, 'Eb': 3, 'E': 4, 'E#': 5, 'Ex': 6,
+        'Fbb': 3, 'Fb': 4, 'F': 5, 'F#': 6, 'Fx': 7,
+        'Gbb': 5, 'Gb': 6, 'G': 7, 'G#': 8, 'Gx': 9,
+        'Abb': 7, 'Ab': 8, 'A': 9, 'A#': 10, 'Ax': 11,
+        'Bbb': 9, 'Bb': 10, 'B': 11, 'B#': 0, 'Bx': 1
+    }
 
-    def setup(self):
-        for note, smts in NoteNameToScalePos.MAP.items():
-            for accid, offset in self.ACCID.items():
-                self.set(note + accid, (smts + offset) % 12)
 
-
-NoteNameToSemi = _NoteNameToSemi(dir='backward')
-NoteNameToSemi.setup()
+NoteNameToSemi = _NoteNameToSemi(_NoteNameToSemi.MAP.items(), dir='backward')
 
 
 class ItvlToSemi:
@@ -64,19 +69,22 @@ class ItvlToSemi:
     MAJ_TYPES = {'DIM': -2, 'MIN': -1, 'MAJ': 0, 'AUG': 1}
     SCALE_MAP = {1: 0, 2: 2, 3: 4, 4: 5, 5: 7, 6: 9, 7: 11}
 
-    @classmethod
-    def setup(cls):
-        sets = [(cls.UNIS_ITVS, cls.UNIS_TYPES),
-                (cls.PERF_ITVS, cls.PERF_TYPES),
-                (cls.MAJ_ITVS, cls.MAJ_TYPES)]
-        for itvl_group, itvl_types in sets:
-            for itv in itvl_group:
-                for pref, offset in itvl_types.items():
-                    setattr(ItvlToSemi, pref + str(itv),
-                            cls.SCALE_MAP[(itv - 1) % 7 + 1] + offset)
-
-
-ItvlToSemi.setup()
+    # Semitones of every interval, from SCALE_MAP offset by the types of its group
+    UNIS1, UNIS8, UNIS15 = 0, 0, 0
+
+    DIM4, PERF4, AUG4 = 4, 5, 6
+    DIM5, PERF5, AUG5 = 6, 7, 8
+    DIM11, PERF11, AUG11 = 4, 5, 6
+    DIM12, PERF12, AUG12 = 6, 7, 8
+
+    DIM2, MIN2, MAJ2, AUG2 = 0, 1, 2, 3
+    DIM3, MIN3, MAJ3, AUG3 = 2, 3, 4, 5
+    DIM6, MIN6, MAJ6, AUG6 = 7, 8, 9, 10
+    DIM7, MIN7, MAJ7, AUG7 = 9, 10, 11, 12
+    DIM9, MIN9, MAJ9, AUG9 = 0, 1, 2, 3
+    DIM10, MIN10, MAJ10, AUG10 = 2, 3, 4, 5
+    DIM13, MIN13, MAJ13, AUG13 = 7, 8, 9, 10
+    DIM14, MIN14, MAJ14, AUG14 = 9, 10, 11, 12
 
 
 class INVS:
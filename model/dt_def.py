@@ -2,9 +2,11 @@ from __future__ import annotations
 
 import re
 from dataclasses import dataclass, field
-from typing import TYPE_CHECKING, Dict, List, Union
+from threading import Lock
+from typing import TYPE_CHECKING, Any, Dict, List, Tuple, Union
 
 if TYPE_CHECKING:
+    from model.chord_formulas import Chord
     from model.satb_elements import AbstractNote, Note, SATBChord
 
 
@@ -89,3 +91,35 @@ class ChordNode:
     chord: SATBChord
     next_nodes: List['ChordNode']
     cost: int
+    lock: Lock = field(default_factory=Lock, repr=False, compare=False)
+
+
+@dataclass
+class FrontierEntry:
+    chord: SATBChord
+    cost: int
+    back_ptrs: List[Tuple]
+
+
+@dataclass
+class FrontierCache:
+    init_key: Tuple
+    formula_names: List[str]
+    config: Dict
+    layers: List[Dict[Tuple, FrontierEntry]]
+
+
+@dataclass
+class PrefixNode:
+    chord_formula: Chord
+    children: Dict[str, PrefixNode] = field(default_factory=dict)
+    progression_idxs: List[int] = field(default_factory=list)
+
+
+@dataclass(frozen=True)
+class Progression:
+    entry_idx: int
+    line_no: int
+    init_cond: str
+    template: List[str]
+    overrides: Dict[str, Any]
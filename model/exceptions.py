@@ -16,3 +16,20 @@ class UnknownChordError(BaseException):
 class UnableToTransitionError(BaseException):
     def __init__(self, message: str):
         self.message = message
+
+
+class InfeasibleProgressionError(UnableToTransitionError):
+    def __init__(self, message: str, rule: str, step: int):
+        self.message = message
+        self.rule = rule
+        self.step = step
+
+
+class FrontierLimitError(BaseException):
+    def __init__(self, message: str):
+        self.message = message
+
+
+class InvalidProgressionError(BaseException):
+    def __init__(self, message: str):
+        self.message = message
@@ -87,6 +87,8 @@ class SATBSequence:
     def __init__(self):
         self.sequence = []
         self.seq_cost = 0
+        # Found with a bounded frontier, so possibly not optimal or not every optimal one
+        self.bounded = False
 
     def add_satb_chord(self, satb_chord: SATBChord, chord_cost: int):
         self.sequence.append(satb_chord)
@@ -1,10 +1,42 @@
 import os
 import sys
+from contextlib import contextmanager
+from contextvars import ContextVar
 from functools import lru_cache
-
-import yaml
+from typing import Any, Dict, List
 
 CONFIG_FILE_NAME = 'solver_config.yaml'
+ENV_PREFIX = 'SATB_'
+
+# Used for any setting missing from solver_config.yaml, the environment and the command line
+DEFAULTS = {
+    'voice_count': 4,
+    'voice_ranges': None,
+    'include_inv': True,
+    'user_intermed': False,
+    'lookahead_depth': 1,
+    'checkpoint_dir': None,
+    'checkpoint_interval': 10,
+    'vectorized': False,
+    'engine': 'bf',
+    'transition_table': None,
+    'shared_cache_path': None,
+    'adaptive_rules': True,
+    'max_frontier_entries': None,
+    'segment_workers': 1,
+    'trace_path': None,
+    'result_cache_entries': None,
+    'candidate_window': 11
+}
+
+# Widest candidate_window, in semitones. VoicePairTable covers the intervals between
+#  voices of any voicing reached with moves up to it.
+MAX_CANDIDATE_WINDOW = 48
+
+_overrides = {}
+# Settings of the entry being solved, when it overrides some of them
+_active_config = ContextVar('active_config', default=None)
+
 
 def _get_config_path():
     return os.path.join(
@@ -14,12 +46,109 @@ def _get_config_path():
         CONFIG_FILE_NAME
     )
 
-@lru_cache(maxsize=1)
-def get_config():
+
+def parse_config_value(value: str) -> Any:
+    # The YAML scalars the settings use, read without a YAML parser
+    lowered = value.strip().lower()
+    if lowered in ('true', 'false'):
+        return lowered == 'true'
+    if lowered in ('null', 'none', '~', ''):
+        return None
+    try:
+        return int(value)
+    except ValueError:
+        return value.strip()
+
+
+def parse_config_overrides(assignments: List[str]) -> Dict[str, Any]:
+    overrides = {}
+    for assignment in assignments:
+        key, sep, value = assignment.partition('=')
+        if not sep:
+            raise ValueError('Setting {} must be given as key=value'.format(assignment))
+        overrides[key.strip()] = parse_config_value(value)
+    return overrides
+
+
+def set_config_overrides(**overrides: Any) -> None:
+    """
+    Settings given on the command line. They take precedence over the environment
+    (SATB_<SETTING>) and solver_config.yaml.
+    """
+    _check_setting_names(overrides)
+    _overrides.update(overrides)
+    _get_base_config.cache_clear()
+
+
+def _check_setting_names(settings: Dict[str, Any]) -> None:
+    for key in settings:
+        if key not in DEFAULTS:
+            raise ValueError('Unknown setting {}'.format(key))
+
+
+def _is_count(value: Any) -> bool:
+    return isinstance(value, int) and not isinstance(value, bool)
+
+
+def _check_setting_values(settings: Dict[str, Any]) -> None:
+    window = settings.get('candidate_window', DEFAULTS['candidate_window'])
+    if not _is_count(window) or not 1 <= window <= MAX_CANDIDATE_WINDOW:
+        raise ValueError('Setting candidate_window must be from 1 to {}, not {}'.format(
+            MAX_CANDIDATE_WINDOW, window
+        ))
+    workers = settings.get('segment_workers', DEFAULTS['segment_workers'])
+    if workers is not None and (not _is_count(workers) or workers < 1):
+        raise ValueError('Setting segment_workers must be 1 or more, or null, not {}'.format(
+            workers
+        ))
+
+
+@contextmanager
+def config_overrides(**overrides: Any):
+    """
+    Overrides settings for the current thread (or context) until the block exits.
+    Work handed to other threads must be run in a copy of the current context.
+    """
+    _check_setting_names(overrides)
+    _check_setting_values(overrides)
+    token = _active_config.set({**get_config(), **overrides} if overrides else get_config())
+    try:
+        yield
+    finally:
+        _active_config.reset(token)
+
+
+def _get_env_config() -> Dict[str, Any]:
+    return {key: parse_config_value(os.environ[ENV_PREFIX + key.upper()])
+            for key in DEFAULTS if ENV_PREFIX + key.upper() in os.environ}
+
+
+def _load_config_file() -> Dict[str, Any]:
+    import yaml
+
+    if not os.path.exists(_get_config_path()):
+        return {}
     with open(_get_config_path(), 'r') as yamlf:
         try:
-            return yaml.safe_load(yamlf)
+            return yaml.safe_load(yamlf) or {}
         except yaml.YAMLError as exc:
             print('Error while parsing {}:'.format(CONFIG_FILE_NAME))
             print(exc)
             sys.exit()
+
+
+@lru_cache(maxsize=1)
+def _get_base_config():
+    explicit = {**_get_env_config(), **_overrides}
+    # Ensure the YAML file is only parsed when it still has something to contribute
+    if all(key in explicit for key in DEFAULTS):
+        config = explicit
+    else:
+        config = {**DEFAULTS, **_load_config_file(), **explicit}
+    _check_setting_values(config)
+    return config
+
+
+def get_config():
+    config = _active_config.get()
+    return config if config is not None else _get_base_config()
@@ -1,12 +1,14 @@
+import re
 from abc import ABC, abstractmethod
 from collections import Counter
+from functools import lru_cache
 from itertools import combinations
-from typing import List
+from typing import Dict, List, Tuple
 
 from model.chord_formulas import (DOM7Chord, DOM9Chord, DOM11Chord, DOM13Chord,
                                   MAJChord, MINChord)
-from model.dt_def import Transition, TransitionContext
-from model.satb_elements import AbstractNote, Note
+from model.classifications import NoteNameToSemi
+from model.dt_def import FreqRange, Transition, TransitionContext
 from model.solver_config import get_config
 
 
@@ -24,24 +26,68 @@ class AllNotesMatchedRule(AbstractRule):
         return len(matchings) == get_config()['voice_count']
 
 
-class ValidParallelIntervalRule(AbstractRule):
+class VoicePairTable:
+    # Flags for a pair of voices, precomputed for every (interval before modulo 12,
+    #  interval after, lower voice moved) so that pair checks are single lookups.
+    #  Intervals after are offset to index into the table. Eight voices an octave
+    #  apart at most span 84 semitones, and moving two of them by up to
+    #  MAX_CANDIDATE_WINDOW (in solver_config) each stays within the offset.
+    PARALLEL = 1
+    SPACING = 2
     VALID_PARALLEL_INTERVALS = {3, 4, 8, 9}
+    OFFSET = 256
+    SPAN = 2 * OFFSET
+
+    @classmethod
+    def _get_flags(cls, before: int, after: int, lower_moved: bool) -> int:
+        flags = 0
+        if (
+            (after % 12 == before) &
+            (after not in cls.VALID_PARALLEL_INTERVALS) & lower_moved
+        ):
+            flags |= cls.PARALLEL
+        if (after <= 0) | (after > 12):
+            flags |= cls.SPACING
+        return flags
+
+    @classmethod
+    def setup(cls):
+        # Built at import, so rows are only computed where _get_flags can differ: the
+        #  spacing flags depend on the interval after alone, and the parallel flag is
+        #  only set on intervals after equal to the one before, modulo 12
+        spacing_row = bytes(cls._get_flags(-1, after - cls.OFFSET, False)
+                            for after in range(cls.SPAN))
+        table = bytearray()
+        for lower_moved in (False, True):
+            for before in range(12):
+                row = bytearray(spacing_row)
+                for after in range((before + cls.OFFSET) % 12 - cls.OFFSET, cls.OFFSET, 12):
+                    row[after + cls.OFFSET] = cls._get_flags(before, after, lower_moved)
+                table += row
+        cls.TABLE = bytes(table)
+
+    @classmethod
+    def lookup(cls, lower_trans: Transition, upper_trans: Transition) -> int:
+        return cls.TABLE[
+            (
+                (lower_trans.abs_pos_changed * 12) +
+                (upper_trans.cur_abs_pos - lower_trans.cur_abs_pos) % 12
+            ) * cls.SPAN +
+            upper_trans.next_abs_pos - lower_trans.next_abs_pos + cls.OFFSET
+        ]
+
+
+VoicePairTable.setup()
+
+
+class ValidParallelIntervalRule(AbstractRule):
+    VALID_PARALLEL_INTERVALS = VoicePairTable.VALID_PARALLEL_INTERVALS
 
     @classmethod
     def validate(cls, matchings: List[Transition], transition_context: TransitionContext):
         # Ensure that the solution does not contain any illegal parallel intervals
-        for trans_pair in combinations(matchings, 2):
-            lower_trans, upper_trans = trans_pair[0], trans_pair[1]
-            if (
-                (
-                    (upper_trans.next_abs_pos - lower_trans.next_abs_pos) % 12 ==
-                    (upper_trans.cur_abs_pos - lower_trans.cur_abs_pos) % 12
-                ) &
-                (
-                    (upper_trans.next_abs_pos - lower_trans.next_abs_pos)
-                    not in cls.VALID_PARALLEL_INTERVALS
-                ) & lower_trans.abs_pos_changed
-            ):
+        for lower_trans, upper_trans in combinations(matchings, 2):
+            if VoicePairTable.lookup(lower_trans, upper_trans) & VoicePairTable.PARALLEL:
                 return False
         return True
 
@@ -52,42 +98,91 @@ class VoicesNotExceedingOctaveNorCrossingRule(AbstractRule):
         # Ensure that the voices do not exceed an octave apart nor have perfect unisons
         #  nor cross each other
         for i in range(1, len(matchings)):
-            lower_trans = matchings[i - 1]
-            upper_trans = matchings[i]
-            if (
-                (upper_trans.next_abs_pos - lower_trans.next_abs_pos <= 0) |
-                (upper_trans.next_abs_pos - lower_trans.next_abs_pos > 12)
-            ):
+            if VoicePairTable.lookup(matchings[i - 1], matchings[i]) & VoicePairTable.SPACING:
                 return False
         return True
 
 
+class ValidVoicePairsRule(AbstractRule):
+    @classmethod
+    def validate(cls, matchings: List[Transition], transition_context: TransitionContext):
+        # Both ValidParallelIntervalRule and VoicesNotExceedingOctaveNorCrossingRule
+        #  in a single pass over voice pairs. Spacing only applies to adjacent voices.
+        table, span, offset = VoicePairTable.TABLE, VoicePairTable.SPAN, VoicePairTable.OFFSET
+        parallel, spacing = VoicePairTable.PARALLEL, VoicePairTable.SPACING
+        curs = [trans.cur_abs_pos for trans in matchings]
+        nexts = [trans.next_abs_pos for trans in matchings]
+        for i in range(len(matchings) - 1):
+            row = (curs[i] != nexts[i]) * 12 * span + offset - nexts[i]
+            for j in range(i + 1, len(matchings)):
+                flags = table[row + (curs[j] - curs[i]) % 12 * span + nexts[j]]
+                if flags & parallel or (j == i + 1 and flags & spacing):
+                    return False
+        return True
+
+
 class VoicesWithinRangeRule(AbstractRule):
-    SOP_RANGE = (Note(AbstractNote('C'), 4), Note(AbstractNote('C'), 6))  # Soprano
-    MS_RANGE = (Note(AbstractNote('A'), 3), Note(AbstractNote('G'), 5))  # Mezzo Soprano
-    ALT_RANGE = (Note(AbstractNote('F'), 3), Note(AbstractNote('D'), 5))  # Alto
-    TEN_RANGE = (Note(AbstractNote('C'), 3), Note(AbstractNote('A'), 4))  # Tenor
-    BAR_RANGE = (Note(AbstractNote('G'), 2), Note(AbstractNote('F'), 4))  # Baritone
-    BASS_RANGE = (Note(AbstractNote('E'), 2), Note(AbstractNote('E'), 4))  # Bass
+    # Absolute positions (octave * 12 + semitone) of each voice's lowest and highest note
+    SOP_RANGE = (48, 72)  # Soprano, C4 - C6
+    MS_RANGE = (45, 67)  # Mezzo Soprano, A3 - G5
+    ALT_RANGE = (41, 62)  # Alto, F3 - D5
+    TEN_RANGE = (36, 57)  # Tenor, C3 - A4
+    BAR_RANGE = (31, 53)  # Baritone, G2 - F4
+    BASS_RANGE = (28, 52)  # Bass, E2 - E4
 
     FOUR_VOICES = [BASS_RANGE, TEN_RANGE, ALT_RANGE, SOP_RANGE]
     FIVE_VOICES = [BASS_RANGE, BAR_RANGE, TEN_RANGE, ALT_RANGE, SOP_RANGE]
     SIX_VOICES = [BASS_RANGE, BAR_RANGE, TEN_RANGE, ALT_RANGE, MS_RANGE, SOP_RANGE]
+    # SSAATBB, and two SATB choirs
+    SEVEN_VOICES = [BASS_RANGE, BAR_RANGE, TEN_RANGE, ALT_RANGE, ALT_RANGE, MS_RANGE, SOP_RANGE]
+    EIGHT_VOICES = [BASS_RANGE, BASS_RANGE, TEN_RANGE, TEN_RANGE,
+                    ALT_RANGE, ALT_RANGE, SOP_RANGE, SOP_RANGE]
+    LAYOUTS = {4: FOUR_VOICES, 5: FIVE_VOICES, 6: SIX_VOICES, 7: SEVEN_VOICES, 8: EIGHT_VOICES}
+    RANGE_MATCHER = re.compile(r'^([A-G](?:bb|b|#|x)?)(\d)-([A-G](?:bb|b|#|x)?)(\d)$')
 
     @classmethod
     def _is_within_range(cls, pos, voice_range):
-        return (pos >= voice_range[0].abs_pos & pos <= voice_range[1].abs_pos)
+        return voice_range[0] <= pos <= voice_range[1]
+
+    @classmethod
+    @lru_cache(maxsize=None)
+    def parse_voice_ranges(cls, voice_ranges: Tuple[str, ...]) -> List[Tuple[int, int]]:
+        """
+        Parses ranges such as ('E2-E4', 'C3-A4'), lowest voice first.
+        """
+        res = []
+        for voice_range in voice_ranges:
+            parts = cls.RANGE_MATCHER.match(voice_range.strip())
+            if parts is None:
+                raise ValueError('Voice range {} is not of the form E2-E4'.format(voice_range))
+            low_note, low_octave, high_note, high_octave = parts.groups()
+            low = int(low_octave) * 12 + NoteNameToSemi.get(low_note)
+            high = int(high_octave) * 12 + NoteNameToSemi.get(high_note)
+            if low > high:
+                raise ValueError('Voice range {} is empty'.format(voice_range))
+            res.append((low, high))
+        return res
+
+    @classmethod
+    def get_voice_ranges(cls, voice_count: int):
+        # The voice_ranges setting takes a list of ranges, or a comma-separated string
+        #  of them when given on the command line or in the environment
+        voice_ranges = get_config().get('voice_ranges')
+        if voice_ranges is None:
+            return cls.LAYOUTS.get(voice_count)
+        if isinstance(voice_ranges, str):
+            voice_ranges = voice_ranges.split(',')
+        voices = cls.parse_voice_ranges(tuple(voice_ranges))
+        if len(voices) != voice_count:
+            raise ValueError('voice_ranges gives {} ranges for {} voices'.format(
+                len(voices), voice_count
+            ))
+        return voices
 
     @classmethod
     def validate(cls, matchings: List[Transition], transition_context: TransitionContext):
         # Ensure that each voice is within range
-        voices = None
-        if len(matchings) == 4:
-            voices = cls.FOUR_VOICES
-        elif len(matchings) == 5:
-            voices = cls.FIVE_VOICES
-        elif len(matchings) == 6:
-            voices = cls.SIX_VOICES
+        voices = cls.get_voice_ranges(get_config()['voice_count'])
         for trans, voice_range in zip(matchings, voices):
             if not cls._is_within_range(trans.next_abs_pos, voice_range):
                 return False
@@ -117,12 +212,15 @@ class DominantNotesResolvingRule(AbstractRule):
                 return False
         return True
 
+    @classmethod
+    def is_dominant(cls, transition_context: TransitionContext) -> bool:
+        return any(type(transition_context.cur_chord_formula) is chord_type
+                   for chord_type in (DOM7Chord, DOM9Chord, DOM11Chord, DOM13Chord))
+
     @classmethod
     def validate(cls, matchings: List[Transition], transition_context: TransitionContext):
         # Ensure that dominant and sustained notes in specific chords resolve properly
-        cur_chord = transition_context.cur_satb_chord
-        if any(type(cur_chord.chord_formula) is chord_type
-               for chord_type in (DOM7Chord, DOM9Chord, DOM11Chord, DOM13Chord)):
+        if cls.is_dominant(transition_context):
             for trans in matchings:
                 if not cls._is_within_tolerance(trans, cls.DOM_TOL):
                     return False
@@ -134,11 +232,7 @@ class DominantNotesResolvingRule(AbstractRule):
 
 class AcceptableNoteFrequenciesRule(AbstractRule):
     @classmethod
-    def validate(cls, matchings: List[Transition], transition_context: TransitionContext):
-        # Ensure that the chord has proper note frequencies
-        pos_counter = Counter()
-        for trans in matchings:
-            pos_counter[trans.next_scale_pos] += 1
+    def get_freq_tolerances(cls, transition_context: TransitionContext) -> Dict[int, FreqRange]:
         # This is an exception reserved for when DOM7 resolves to tonic
         exc = (
             (
@@ -154,7 +248,15 @@ class AcceptableNoteFrequenciesRule(AbstractRule):
                 )
             )
         )
-        freq_tol = transition_context.next_satb_chord.chord_formula.get_note_freqs(exc)
+        return transition_context.next_satb_chord.chord_formula.get_note_freqs(exc)
+
+    @classmethod
+    def validate(cls, matchings: List[Transition], transition_context: TransitionContext):
+        # Ensure that the chord has proper note frequencies
+        pos_counter = Counter()
+        for trans in matchings:
+            pos_counter[trans.next_scale_pos] += 1
+        freq_tol = cls.get_freq_tolerances(transition_context)
         for pos, freq_range in freq_tol.items():
             if (
                 (pos_counter.get(pos, 0) < freq_range.min_freq) |
@@ -0,0 +1,22 @@
+import argparse
+
+from satb_solver.search_trace import TraceReplay
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description='Summarize a search trace recorded with trace_path, and list the '
+                    'optimal sequences of its solves without solving again'
+    )
+    parser.add_argument('trace', type=str, nargs=1,
+                        help='Path of the trace file')
+    parser.add_argument('--top', type=int, default=10,
+                        help='Number of transition searches and of optimal sequences listed')
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    args = parse_args()
+    replay = TraceReplay(args.trace[0])
+    print(replay.format_summary(args.top))
+    print(replay.format_solves(args.top))
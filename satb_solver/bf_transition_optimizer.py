@@ -1,57 +1,107 @@
 import heapq
-import math
 from collections import namedtuple
-from typing import Any, Dict, List, Tuple
+from typing import Any, Dict, List, Set, Tuple
 
 from model.dt_def import MatchConfig, NotePosPair, Transition
+from model.exceptions import FrontierLimitError
+from model.solver_config import get_config
 from model.transition_rules import (AcceptableNoteFrequenciesRule,
                                     AllNotesMatchedRule,
                                     DominantNotesResolvingRule,
-                                    ValidParallelIntervalRule,
-                                    VoicesNotExceedingOctaveNorCrossingRule,
-                                    VoicesWithinRangeRule)
+                                    ValidVoicePairsRule, VoicesWithinRangeRule)
+from satb_solver.rule_order import AdaptiveRuleOrder
+from satb_solver.search_trace import get_search_trace
+from satb_solver.vectorized_validator import get_vectorized_validator
 
 
 class BFTransitionOptimizer:
-    def __init__(self, prioritized_checker, transition_context):
+    # The order is important, doing common failures first.
+    RULES = [
+        AcceptableNoteFrequenciesRule,
+        ValidVoicePairsRule,
+        AllNotesMatchedRule,
+        DominantNotesResolvingRule,
+        VoicesWithinRangeRule
+    ]
+
+    def __init__(self, prioritized_checker, transition_context,
+                 rule_order: AdaptiveRuleOrder = None):
         self.prioritized_checker = prioritized_checker
         self.transition_context = transition_context
+        self.rule_order = rule_order
         self.cur_depth_configs = []
         self.next_depth_configs = []
-        self.checked = set()
-
-    def _get_hashable_matchings(self, transitions: List[Transition]) -> int:
-        return sum(math.sin(trans.cur_abs_pos * trans.next_abs_pos) for trans in transitions)
+        self.vectorized_validator = get_vectorized_validator(transition_context)
+        self.max_entries = get_config()['max_frontier_entries']
+        self.trace = get_search_trace()
 
-    def _add_to_next_depth(self, new_config: MatchConfig) -> None:
-        hashable_config_matching = self._get_hashable_matchings(new_config.matchings.values())
-        if hashable_config_matching not in self.checked:
-            self.checked.add(hashable_config_matching)
-            self.next_depth_configs.append(new_config)
+    def _check_frontier_size(self, size: int) -> None:
+        if self.max_entries is not None and size > self.max_entries:
+            raise FrontierLimitError('{} configurations exceed max_frontier_entries of {}'.format(
+                size, self.max_entries
+            ))
 
     def _is_valid_config(self, config: MatchConfig) -> Any:
         ordered_matchings = sorted(
             [trans for trans in config.matchings.values()],
             key=lambda trans: trans.cur_abs_pos
         )
-        # The order is important, doing common failures first.
-        for validator in [
-            AcceptableNoteFrequenciesRule,
-            ValidParallelIntervalRule,
-            VoicesNotExceedingOctaveNorCrossingRule,
-            AllNotesMatchedRule,
-            DominantNotesResolvingRule,
-            VoicesWithinRangeRule
-        ]:
+        return self._is_valid_matchings(ordered_matchings)
+
+    def _is_valid_matchings(self, ordered_matchings: List[Transition]) -> bool:
+        if self.rule_order is not None:
+            return self.rule_order.validate(ordered_matchings, self.transition_context)
+        for validator in self.RULES:
             if not validator.validate(ordered_matchings, self.transition_context):
                 return False
         return True
 
+    def _trace_check(self, configs: List[MatchConfig]) -> None:
+        # The rule that rejects each invalid configuration, in the order rules are applied
+        rules = self.rule_order.order if self.rule_order is not None else self.RULES
+        rejects = {}
+        for config in configs:
+            ordered_matchings = sorted(config.matchings.values(),
+                                       key=lambda trans: trans.cur_abs_pos)
+            for rule in rules:
+                if not rule.validate(ordered_matchings, self.transition_context):
+                    rejects[rule.__name__] = rejects.get(rule.__name__, 0) + 1
+                    break
+        self.trace.record('check', configs=len(configs),
+                          valid=len(configs) - sum(rejects.values()), rejects=rejects)
+
+    def _get_voice_candidates(self) -> List[List[Transition]]:
+        # Every candidate transition of each voice, lowest current voice first
+        candidates = {}
+        for _, transitions in self.prioritized_checker:
+            for trans in transitions:
+                candidates.setdefault(trans.cur_abs_pos, []).append(trans)
+        return [candidates[cur_abs_pos] for cur_abs_pos in sorted(candidates)]
+
+    @staticmethod
+    def _get_trans_cost(trans: Transition) -> int:
+        return trans.min_diff if trans.min_diff != -1 else trans.abs_pos_diff
+
+    def _simplify_config(self, config: MatchConfig) -> Set[NotePosPair]:
+        return {tr.next_pair for tr in config.matchings.values()}
+
+    def _get_vectorized_min_cost_config(
+        self, configs: List[MatchConfig]
+    ) -> Tuple[List[NotePosPair], int]:
+        mask, costs = self.vectorized_validator.evaluate(configs)
+        if self.trace is not None:
+            self.trace.record('check', configs=len(configs), valid=int(mask.sum()))
+        if not mask.any():
+            return [], 0
+        min_cost = costs[mask].min()
+        return [self._simplify_config(config)
+                for config, valid, cost in zip(configs, mask, costs)
+                if valid and cost == min_cost], int(min_cost)
+
     def _get_min_cost_config(
         self, configs: List[MatchConfig]
     ) -> Tuple[List[NotePosPair], int]:
-        def simplify_config(config):
-            return {tr.next_pair for tr in config.matchings.values()}
+        simplify_config = self._simplify_config
         min_cost = 999999
         res = []
         for config in configs:
@@ -66,13 +116,19 @@ class BFTransitionOptimizer:
         return res, min_cost
 
     def solve(self) -> Tuple[List[NotePosPair], int]:
+        # The configurations are every choice of one transition per voice seen so far.
+        #  Of those only differing in the transition of the voice of a new transition,
+        #  only the one holding the voice's first transition branches off, as each
+        #  would branch off the same configuration.
+        first_matchings = {}
         for _ in range(len(self.prioritized_checker)):
             diff, transitions = heapq.heappop(self.prioritized_checker)
             for test_trans in transitions:
                 self.next_depth_configs = []
                 # If there are no configurations present, make initial configuration
                 if len(self.cur_depth_configs) == 0:
-                    self._add_to_next_depth(
+                    first_matchings[test_trans.cur_abs_pos] = test_trans
+                    self.next_depth_configs.append(
                         MatchConfig(matchings={test_trans.cur_abs_pos: test_trans})
                     )
                 else:
@@ -81,23 +137,42 @@ class BFTransitionOptimizer:
                         #  taking highest priority
                         if diff == -1:
                             self.next_depth_configs.append(cur_depth_config)
-                            self._add_to_next_depth(
+                            self.next_depth_configs.append(
                                 MatchConfig(matchings={test_trans.cur_abs_pos: test_trans})
                             )
                             continue
                         # If transition target is already matched, split off and
                         #  duplicate configuration
-                        if test_trans.cur_abs_pos in cur_depth_config.matchings:
+                        matched = cur_depth_config.matchings.get(test_trans.cur_abs_pos)
+                        if matched is not None:
                             self.next_depth_configs.append(cur_depth_config)
+                            if matched is not first_matchings[test_trans.cur_abs_pos]:
+                                continue
+                        else:
+                            first_matchings.setdefault(test_trans.cur_abs_pos, test_trans)
                         cur_depth_config_matchings = cur_depth_config.matchings.copy()
                         cur_depth_config_matchings[test_trans.cur_abs_pos] = test_trans
-                        self._add_to_next_depth(
+                        self.next_depth_configs.append(
                             MatchConfig(matchings=cur_depth_config_matchings)
                         )
+                self._check_frontier_size(len(self.next_depth_configs))
                 self.cur_depth_configs = self.next_depth_configs
+            if self.trace is not None:
+                self.trace.record('pop', diff=diff, trans=len(transitions),
+                                  configs=len(self.cur_depth_configs))
             # If there are valid configurations, SUCCESS, otherwise, continue on
             #  with all invalid configurations.
+            if (
+                self.vectorized_validator is not None and
+                len(self.cur_depth_configs) >= self.vectorized_validator.MIN_BATCH
+            ):
+                res, min_cost = self._get_vectorized_min_cost_config(self.cur_depth_configs)
+                if len(res) > 0:
+                    return res, min_cost
+                continue
             valids = list(filter(self._is_valid_config, self.cur_depth_configs))
+            if self.trace is not None:
+                self._trace_check(self.cur_depth_configs)
             if len(valids) > 0:
                 return self._get_min_cost_config(valids)
         # If no valid configurations could be found, indicate so
@@ -0,0 +1,103 @@
+from typing import List, Set, Tuple
+
+from model.dt_def import NotePosPair, Transition
+from model.solver_config import get_config
+from model.transition_rules import (AcceptableNoteFrequenciesRule,
+                                    DominantNotesResolvingRule, VoicePairTable,
+                                    VoicesWithinRangeRule)
+from satb_solver.bf_transition_optimizer import BFTransitionOptimizer
+
+
+class BnBTransitionOptimizer(BFTransitionOptimizer):
+    """
+    Depth-first branch and bound over the voices, lowest first. Finds the same
+    transitions as BFTransitionOptimizer (the cheapest valid configurations among those
+    whose largest transition difference is smallest), but never enumerates the
+    configurations of a bucket: a partial configuration is dropped as soon as a placed
+    voice breaks a rule, or as soon as its bound can no longer reach the best found.
+    Its cost grows with the number of surviving partial configurations rather than
+    with the product of every voice's candidates, which keeps 7 and 8 voices practical.
+    """
+
+    def __init__(self, prioritized_checker, transition_context, rule_order=None):
+        super(BnBTransitionOptimizer, self).__init__(prioritized_checker,
+                                                     transition_context, rule_order)
+        self.freq_tol = AcceptableNoteFrequenciesRule.get_freq_tolerances(transition_context)
+        self.tolerances = dict(DominantNotesResolvingRule.SUS_TOL)
+        if DominantNotesResolvingRule.is_dominant(transition_context):
+            self.tolerances.update(DominantNotesResolvingRule.DOM_TOL)
+        self.voice_ranges = VoicesWithinRangeRule.get_voice_ranges(get_config()['voice_count'])
+
+    def _is_placeable(self, trans: Transition, matchings: List[Transition],
+                      counts: dict) -> bool:
+        # Rules checked one voice at a time, against the voices already placed below it
+        freq = self.freq_tol.get(trans.next_scale_pos)
+        if freq is not None and counts.get(trans.next_scale_pos, 0) >= freq.max_freq:
+            return False
+        if not DominantNotesResolvingRule._is_within_tolerance(trans, self.tolerances):
+            return False
+        if not VoicesWithinRangeRule._is_within_range(trans.next_abs_pos,
+                                                      self.voice_ranges[len(matchings)]):
+            return False
+        if (
+            len(matchings) > 0 and
+            VoicePairTable.lookup(matchings[-1], trans) & VoicePairTable.SPACING
+        ):
+            return False
+        return not any(VoicePairTable.lookup(lower, trans) & VoicePairTable.PARALLEL
+                       for lower in matchings)
+
+    def _can_complete(self, counts: dict, remaining: int) -> bool:
+        missing = sum(max(0, freq.min_freq - counts.get(pos, 0))
+                      for pos, freq in self.freq_tol.items())
+        return missing <= remaining
+
+    def solve(self) -> Tuple[List[Set[NotePosPair]], int]:
+        voice_candidates = self._get_voice_candidates()
+        voice_count = get_config()['voice_count']
+        if len(voice_candidates) != voice_count:
+            return [], 0
+        trans_cost = self._get_trans_cost
+        voice_candidates = [
+            sorted(candidates, key=lambda trans: (trans.min_diff, trans_cost(trans)))
+            for candidates in voice_candidates
+        ]
+        # Lower bounds of the largest difference and of the cost of the voices above each
+        suffix_max, suffix_cost = [-1] * (voice_count + 1), [0] * (voice_count + 1)
+        for voice in range(voice_count - 1, -1, -1):
+            suffix_max[voice] = max(suffix_max[voice + 1],
+                                    min(trans.min_diff for trans in voice_candidates[voice]))
+            suffix_cost[voice] = suffix_cost[voice + 1] + min(
+                trans_cost(trans) for trans in voice_candidates[voice]
+            )
+
+        best, res = (float('inf'), float('inf')), []
+        matchings, counts = [], {}
+
+        def search(voice: int, cur_max: int, cost: int) -> None:
+            nonlocal best, res
+            if voice == voice_count:
+                if (cur_max, cost) <= best and self._is_valid_matchings(matchings):
+                    if (cur_max, cost) < best:
+                        best, res = (cur_max, cost), []
+                    res.append({trans.next_pair for trans in matchings})
+                return
+            for trans in voice_candidates[voice]:
+                next_max = max(cur_max, trans.min_diff)
+                next_cost = cost + trans_cost(trans)
+                if (
+                    (max(next_max, suffix_max[voice + 1]), next_cost + suffix_cost[voice + 1]) >
+                    best
+                ):
+                    continue
+                if not self._is_placeable(trans, matchings, counts):
+                    continue
+                counts[trans.next_scale_pos] = counts.get(trans.next_scale_pos, 0) + 1
+                if self._can_complete(counts, voice_count - voice - 1):
+                    matchings.append(trans)
+                    search(voice + 1, next_max, next_cost)
+                    matchings.pop()
+                counts[trans.next_scale_pos] -= 1
+
+        search(0, -1, 0)
+        return res, (best[1] if len(res) > 0 else 0)
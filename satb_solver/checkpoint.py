@@ -0,0 +1,90 @@
+import json
+import os
+from typing import Dict, List, Optional, Tuple
+
+from model.chord_formulas import Chord
+from model.dt_def import FrontierEntry, NotePosPair
+from model.satb_elements import Note, SATBChord
+
+
+class FrontierCheckpoint:
+    """
+    Append-only checkpoint of the per-step frontiers of a solve. The first line holds
+    the solve fingerprint, every following line one frontier as compact JSON:
+    [cost, [scale pos, octave, ...], [back-pointer indices into previous frontier]].
+    """
+
+    def __init__(self, checkpoint_dir: str, fingerprint: str, interval: int):
+        self.checkpoint_dir = checkpoint_dir
+        self.path = os.path.join(checkpoint_dir, fingerprint + '.ckpt')
+        self.fingerprint = fingerprint
+        self.interval = max(1, interval)
+        self.saved_steps = 0
+
+    def _encode_layer(self, layer: Dict[Tuple, FrontierEntry],
+                      prev_layer: Optional[Dict[Tuple, FrontierEntry]]) -> str:
+        prev_idxs = {key: idx for idx, key in enumerate(prev_layer or {})}
+        encoded = []
+        for entry in layer.values():
+            notes = []
+            for pair in entry.chord.key_pos_pairs:
+                notes.extend((pair.scale_pos, pair.note_repr.octave))
+            encoded.append([entry.cost, notes, [prev_idxs[key] for key in entry.back_ptrs]])
+        return json.dumps(encoded, separators=(',', ':'))
+
+    def _decode_layer(self, encoded: List, chord_formula: Chord,
+                      prev_keys: List[Tuple]) -> Dict[Tuple, FrontierEntry]:
+        note_mapping = chord_formula.get_itvl_note_mapping()
+        layer = {}
+        for cost, notes, back_idxs in encoded:
+            satb_chord = SATBChord(chord_formula, [
+                NotePosPair(scale_pos, Note(note_mapping.get(scale_pos), octave))
+                for scale_pos, octave in zip(notes[::2], notes[1::2])
+            ])
+            layer[satb_chord._key()] = FrontierEntry(
+                satb_chord, cost, [prev_keys[idx] for idx in back_idxs]
+            )
+        return layer
+
+    def load(self, chord_seq: List[Chord]) -> List[Dict[Tuple, FrontierEntry]]:
+        if not os.path.exists(self.path):
+            return []
+        layers = []
+        with open(self.path, 'r') as cf:
+            if cf.readline().strip() != self.fingerprint:
+                return []
+            for line in cf:
+                # A line cut short by an interruption is discarded with everything after it
+                if not line.endswith('\n') or len(layers) >= len(chord_seq):
+                    break
+                layers.append(self._decode_layer(
+                    json.loads(line), chord_seq[len(layers)], list(layers[-1]) if layers else []
+                ))
+        self.saved_steps = len(layers)
+        # Drop any partial trailing line so further appends start on a clean line
+        with open(self.path, 'r+') as cf:
+            cf.readline()
+            for _ in range(self.saved_steps):
+                cf.readline()
+            cf.truncate(cf.tell())
+        return layers
+
+    def save(self, layers: List[Dict[Tuple, FrontierEntry]], force: bool = False) -> None:
+        if not force and len(layers) - self.saved_steps < self.interval:
+            return
+        mode = 'a' if self.saved_steps > 0 else 'w'
+        os.makedirs(self.checkpoint_dir, exist_ok=True)
+        with open(self.path, mode) as cf:
+            if mode == 'w':
+                cf.write(self.fingerprint + '\n')
+            for step in range(self.saved_steps, len(layers)):
+                cf.write(self._encode_layer(layers[step], layers[step - 1] if step else None))
+                cf.write('\n')
+            cf.flush()
+            os.fsync(cf.fileno())
+        self.saved_steps = len(layers)
+
+    def clear(self) -> None:
+        if os.path.exists(self.path):
+            os.remove(self.path)
+        self.saved_steps = 0
@@ -1,47 +1,68 @@
 import heapq
 import re
 from collections import namedtuple
-from copy import deepcopy
+from contextvars import copy_context
 from dataclasses import dataclass
-from itertools import product
-from typing import Dict, List, Set, Tuple
-
-from termcolor import colored
+from itertools import islice, product
+from threading import Event
+from time import perf_counter_ns
+from typing import Dict, List, Optional, Set, Tuple
 
 from model.chord_formulas import Chord
-from model.dt_def import ChordNode, NotePosPair, Transition, TransitionContext
-from model.exceptions import UnableToTransitionError
+from model.dt_def import (ChordNode, FrontierCache, FrontierEntry, NotePosPair,
+                          PrefixNode, Transition, TransitionContext)
+from model.exceptions import FrontierLimitError, UnableToTransitionError
 from model.satb_elements import AbstractNote, Note, SATBChord, SATBSequence
-from model.solver_config import get_config
+from model.solver_config import DEFAULTS, config_overrides, get_config
+from model.transition_rules import VoicesWithinRangeRule
 from satb_solver.bf_transition_optimizer import BFTransitionOptimizer
-from satb_solver.solution_interface import SolutionInterface
+from satb_solver.bnb_transition_optimizer import BnBTransitionOptimizer
+from satb_solver.checkpoint import FrontierCheckpoint
+from satb_solver.feasibility import FeasibilityChecker
+from satb_solver.fingerprint import get_solve_fingerprint
+from satb_solver.indexed_transition_optimizer import IndexedTransitionOptimizer
+from satb_solver.pinned_search import PinnedSearch
+from satb_solver.rule_order import AdaptiveRuleOrder
+from satb_solver.search_trace import get_search_trace
+from satb_solver.shared_cache import get_shared_cache
+from satb_solver.solution_interface import SolutionInterface, colored
+from satb_solver.transition_table import get_transition_table
 
 
 class ChordTransitioner:
     COST_LEAD_THRES = 100000
+    # Moves of up to this many semitones reach the nearest note of every pitch class,
+    #  below and above
+    OCTAVE_WINDOW = 11
+    ENGINES = {
+        'bf': BFTransitionOptimizer,
+        'indexed': IndexedTransitionOptimizer,
+        'bnb': BnBTransitionOptimizer
+    }
 
     def __init__(self):
-        pass
-
-    def _min_diff(self, abs_note: int, rel_note: int, full=False) -> Tuple[int, Set[int]]:
-        octave, rel_abs_note = abs_note // 12, abs_note % 12
-        if rel_note == rel_abs_note:
-            return [(0, abs_note)]
-        offset = 0 if rel_note < rel_abs_note else -1
-        lower_abs_note = (octave + offset) * 12 + rel_note
-        upper_abs_note = (octave + offset + 1) * 12 + rel_note
-        if full:
-            return [(-1, lower_abs_note), (-1, upper_abs_note)]
-        return [(abs_note - lower_abs_note, lower_abs_note),
-                (upper_abs_note - abs_note, upper_abs_note)]
+        self.frontier_cache = None
+        self.feasibility_checker = FeasibilityChecker()
+        # Rule statistics are kept across every transition this transitioner solves
+        self.rule_order = AdaptiveRuleOrder(BFTransitionOptimizer.RULES)
+
+    def _min_diff(self, abs_note: int, rel_note: int, full=False,
+                  window: int = OCTAVE_WINDOW) -> List[Tuple[int, int]]:
+        # Every note of the pitch class within window semitones, lowest first; a note
+        #  held in place costs nothing even when moving is matched in full
+        lowest_abs_note = abs_note - window + (rel_note - abs_note + window) % 12
+        return [(0 if next_abs_note == abs_note else -1 if full else abs(next_abs_note - abs_note),
+                 next_abs_note)
+                for next_abs_note in range(lowest_abs_note, abs_note + window + 1, 12)]
 
     def _agg_trans(self, cur_abs_note: NotePosPair, next_rel_note: NotePosPair,
-                   trans_agg: Dict[int, Set[Transition]], full=False) -> None:
+                   trans_agg: Dict[int, Set[Transition]], full=False,
+                   window: int = OCTAVE_WINDOW) -> None:
         min_diff_notes = (
             self._min_diff(
                 cur_abs_note.note_repr.abs_pos,
                 next_rel_note.note_repr.semi_pos,
-                full
+                full, window
             )
         )
         for min_transition_diff, abs_pos in min_diff_notes:
@@ -64,7 +85,7 @@ class ChordTransitioner:
         base_pair = [pair for pair in pairs if pair.note_repr.semi_pos == formula_base.semi_pos]
         if len(base_pair) >= 2:
             base_pair = sorted(base_pair, key=lambda pair: pair.note_repr.abs_pos)
-            base_pair, other_pair = base_pair[0], [base_pair[1]]
+            base_pair, other_pair = base_pair[0], base_pair[1:]
         else:
             base_pair, other_pair = base_pair[0], []
         other_pairs = [pair for pair in pairs if pair.note_repr.semi_pos != formula_base.semi_pos]
@@ -72,7 +93,8 @@ class ChordTransitioner:
 
     def _get_checking_priority(self, cur_abs_notes: List[NotePosPair],
                                next_rel_notes: List[NotePosPair],
-                               trans_context: TransitionContext) -> List:
+                               trans_context: TransitionContext,
+                               window: int = OCTAVE_WINDOW) -> List:
         transition_aggregator = {}
         agg_checker_queue = []
         if get_config()['include_inv']:
@@ -82,173 +104,574 @@ class ChordTransitioner:
             next_base, _ = self._split_by_base(
                 next_rel_notes, trans_context.next_satb_chord.chord_formula
             )
-            self._agg_trans(cur_base, next_base, transition_aggregator, full=True)
+            self._agg_trans(cur_base, next_base, transition_aggregator, full=True, window=window)
         for (cur_abs_note, next_rel_note) in product(cur_abs_notes, next_rel_notes):
-            self._agg_trans(cur_abs_note, next_rel_note, transition_aggregator)
+            self._agg_trans(cur_abs_note, next_rel_note, transition_aggregator, window=window)
         for (diff, transitions) in transition_aggregator.items():
             heapq.heappush(agg_checker_queue, (diff, transitions))
         return agg_checker_queue
 
     def find_optimal_transition(self, cur_satb_chord: SATBChord,
                                 next_chord: SATBChord) -> Tuple[List, int]:
+        # Precomputed transitions are used when available, otherwise searched live
+        transition_table = get_transition_table()
+        if transition_table is not None:
+            result = transition_table.lookup(cur_satb_chord, next_chord.chord_formula)
+            if result is not None:
+                return result
+        # Then the transitions other processes have already searched
+        shared_cache = get_shared_cache()
+        if shared_cache is not None:
+            result = shared_cache.lookup(cur_satb_chord, next_chord.chord_formula)
+            if result is not None:
+                return result
+        result = self.search_optimal_transition(cur_satb_chord, next_chord)
+        if shared_cache is not None:
+            shared_cache.store(cur_satb_chord, next_chord.chord_formula, *result)
+        return result
+
+    def search_optimal_transition(self, cur_satb_chord: SATBChord,
+                                  next_chord: SATBChord) -> Tuple[List, int]:
+        trace = get_search_trace()
+        if trace is None:
+            return self._search_optimal_transition(cur_satb_chord, next_chord)
+        with trace.grouped():
+            trace.record('transition', cur_formula=cur_satb_chord.chord_formula.formula_name,
+                         cur=[note.note_name + str(note.octave)
+                              for note in cur_satb_chord._key()],
+                         next_formula=next_chord.chord_formula.formula_name)
+            t0 = perf_counter_ns()
+            results, tr_cost = self._search_optimal_transition(cur_satb_chord, next_chord)
+            trace.record('result', cost=tr_cost, count=len(results),
+                         ns=perf_counter_ns() - t0)
+        return results, tr_cost
+
+    def _search_optimal_transition(self, cur_satb_chord: SATBChord,
+                                   next_chord: SATBChord) -> Tuple[List, int]:
         transition_context = TransitionContext(cur_satb_chord, next_chord)
-        prioritized_checker = self._get_checking_priority(
-            cur_satb_chord.key_pos_pairs,
-            next_chord.chord_formula.get_key_pos_pairs(),
-            transition_context
-        )
-        return BFTransitionOptimizer(
-            prioritized_checker, transition_context
-        ).solve()
-
-    def _get_agg_min_cost_seqs(self, next_seqs: List[SATBSequence]) -> List[SATBSequence]:
-        # Equivalent operation: sequence group-by, then aggregate by min cost
-        min_overall_cost = min(next_seqs, key=lambda seq: seq.seq_cost).seq_cost
-        seq_agg = {}
-        queued_seqs = []
-        for seq in next_seqs:
-            if hash(seq) in seq_agg:
-                seq_agg[hash(seq)].append(seq)
+        rule_order = self.rule_order if get_config()['adaptive_rules'] else None
+        # Wider moves are only generated, an octave at a time, when no transition keeps
+        #  within the narrower window, as none of them could be preferred to one that does
+        window = get_config()['candidate_window']
+        for stage_window in range(self.OCTAVE_WINDOW, window + 12, 12):
+            results, tr_cost = self._solve_transition(cur_satb_chord, next_chord,
+                                                      transition_context, rule_order,
+                                                      min(stage_window, window))
+            if len(results) > 0:
+                break
+        return results, tr_cost
+
+    def _solve_transition(self, cur_satb_chord: SATBChord, next_chord: SATBChord,
+                          transition_context: TransitionContext,
+                          rule_order: Optional[AdaptiveRuleOrder],
+                          window: int) -> Tuple[List, int]:
+        # Past an octave, the candidates of every voice multiply, so only the depth-first
+        #  search is used, which drops a partial configuration as soon as a voice breaks
+        #  a rule or its cost can no longer beat the best one found
+        engine = self.ENGINES[get_config()['engine']]
+        if window > self.OCTAVE_WINDOW:
+            engine = BnBTransitionOptimizer
+        try:
+            return engine(
+                self._get_checking_priority(cur_satb_chord.key_pos_pairs,
+                                            next_chord.chord_formula.get_key_pos_pairs(),
+                                            transition_context, window),
+                transition_context, rule_order
+            ).solve()
+        except FrontierLimitError:
+            # Depth-first search only holds one partial configuration at a time and
+            #  finds the same transitions, so the result stays optimal
+            return BnBTransitionOptimizer(
+                self._get_checking_priority(cur_satb_chord.key_pos_pairs,
+                                            next_chord.chord_formula.get_key_pos_pairs(),
+                                            transition_context, window),
+                transition_context, rule_order
+            ).solve()
+
+    def _get_agg_min_cost_seqs(
+        self, next_entries: List[Tuple[SATBChord, int, Tuple]]
+    ) -> Dict[Tuple, FrontierEntry]:
+        # Equivalent operation: group-by arrived configuration, then aggregate by min cost,
+        #  remembering every previous configuration that reaches it at that cost.
+        min_overall_cost = min(cost for _, cost, _ in next_entries)
+        frontier = {}
+        for satb_chord, cost, prev_key in next_entries:
+            if cost > min_overall_cost + self.COST_LEAD_THRES:
+                continue
+            key = satb_chord._key()
+            entry = frontier.get(key)
+            if entry is None or cost < entry.cost:
+                frontier[key] = FrontierEntry(satb_chord, cost, [prev_key])
+            elif cost == entry.cost:
+                entry.back_ptrs.append(prev_key)
+        trace = get_search_trace()
+        if trace is not None:
+            trace.record('aggregate', candidates=len(next_entries),
+                         over_lead=sum(cost > min_overall_cost + self.COST_LEAD_THRES
+                                       for _, cost, _ in next_entries),
+                         configs=len(frontier))
+        return frontier
+
+    def _bound_frontier(
+        self, frontier: Dict[Tuple, FrontierEntry]
+    ) -> Dict[Tuple, FrontierEntry]:
+        # Bounded mode: past max_frontier_entries, only the cheapest entries go on
+        max_entries = get_config()['max_frontier_entries']
+        if max_entries is None or len(frontier) <= max_entries:
+            return frontier
+        return dict(heapq.nsmallest(max_entries, frontier.items(),
+                                    key=lambda item: item[1].cost))
+
+    def _is_bounded(self, layers: List[Dict[Tuple, FrontierEntry]]) -> bool:
+        # A frontier at the limit may have been cut, including one resumed from a
+        #  checkpoint or reused from the previous solve
+        max_entries = get_config()['max_frontier_entries']
+        return max_entries is not None and any(len(layer) >= max_entries
+                                               for layer in layers[1:])
+
+    def _get_abs_min_cost_seqs(
+        self, layers: List[Dict[Tuple, FrontierEntry]]
+    ) -> List[SATBSequence]:
+        # Follow back-pointers from every globally optimal final configuration
+        #  to enumerate all optimal sequences.
+        max_entries = get_config()['max_frontier_entries']
+        bounded = self._is_bounded(layers)
+        min_overall_cost = min(entry.cost for entry in layers[-1].values())
+        partial_paths = [[entry] for entry in layers[-1].values()
+                         if entry.cost == min_overall_cost]
+        for step in range(len(layers) - 2, -1, -1):
+            paths = ([layers[step][prev_key]] + path
+                     for path in partial_paths
+                     for prev_key in path[0].back_ptrs)
+            # Optimal sequences can be exponentially many, so only some are listed
+            if max_entries is None:
+                partial_paths = list(paths)
             else:
-                seq_agg[hash(seq)] = [seq]
-        for _, seqs in seq_agg.items():
-            min_seq_cost = min(seqs, key=lambda seq: seq.seq_cost).seq_cost
-            for seq in seqs:
-                if seq.seq_cost > min_overall_cost + self.COST_LEAD_THRES:
-                    continue
-                if seq.seq_cost == min_seq_cost:
-                    queued_seqs.append(seq)
-        return queued_seqs
-
-    def _get_abs_min_cost_seqs(self, final_seqs: List[SATBSequence]) -> List[SATBSequence]:
-        min_overall_cost = min(final_seqs, key=lambda seq: seq.seq_cost).seq_cost
+                partial_paths = list(islice(paths, max_entries + 1))
+                if len(partial_paths) > max_entries:
+                    del partial_paths[max_entries:]
+                    bounded = True
         res = []
-        for seq in final_seqs:
-            if seq.seq_cost == min_overall_cost:
-                res.append(seq)
+        for path in partial_paths:
+            seq, prev_cost = SATBSequence(), 0
+            for entry in path:
+                seq.add_satb_chord(entry.chord, entry.cost - prev_cost)
+                prev_cost = entry.cost
+            seq.bounded = bounded
+            res.append(seq)
         return res
 
-    def _infer_init_note_pos(self, init_notes: List[str],
-                             init_model_chord: Chord) -> Set[NotePosPair]:
+    def get_transitions(self, cur_satb_chord: SATBChord,
+                        next_chord_formula: Chord) -> List[Tuple[SATBChord, int]]:
+        # Find NotePosPair and transition cost solutions of target configuration
+        results, tr_cost = self.find_optimal_transition(
+            cur_satb_chord,
+            SATBChord(next_chord_formula, None)
+        )
+        return [(SATBChord(next_chord_formula, result), tr_cost) for result in results]
+
+    def _advance_frontier(self, frontier: Dict[Tuple, FrontierEntry], next_chord_formula: Chord,
+                          pinned_search: PinnedSearch = None,
+                          step: int = None) -> Dict[Tuple, FrontierEntry]:
+        next_entries = []
+        # For each configuration in the frontier, find optimal transitions (or, towards
+        #  a pinned voicing, those that can still reach it)
+        for key, entry in frontier.items():
+            if pinned_search is not None:
+                transitions = pinned_search.get_transitions(entry.chord, step)
+            else:
+                transitions = self.get_transitions(entry.chord, next_chord_formula)
+            # Each new SATBChord branches off the configuration it was reached from
+            next_entries.extend((satb_chord, entry.cost + tr_cost, key)
+                                for satb_chord, tr_cost in transitions)
+        if len(next_entries) == 0:
+            return {}
+        return self._bound_frontier(self._get_agg_min_cost_seqs(next_entries))
+
+    def _infer_init_note_pos(self, init_notes: List[str], init_model_chord: Chord,
+                             source: str = 'Initial', check_inv: bool = True) -> Set[NotePosPair]:
         result = set()
         rev_map = init_model_chord.get_itvl_note_mapping()
 
         for init_note in init_notes:
             parts = re.search(r'^([A-G])(bb|b|#|x)?(\d)$', init_note)
             if parts is None:
-                raise ValueError('Initial note {}: unreadable format.'.format(init_note))
+                raise ValueError('{} note {}: unreadable format.'.format(source, init_note))
 
             abs_note = AbstractNote(parts.group(1) + (parts.group(2) or ''))
             scale_pos = rev_map.get(abs_note, inv=True)
             if scale_pos is None:
-                raise ValueError('Initial note {}: does not belong in {} chord.'.format(
-                    init_note, init_model_chord.formula_name
+                raise ValueError('{} note {}: does not belong in {} chord.'.format(
+                    source, init_note, init_model_chord.formula_name
                 ))
 
             pair = NotePosPair(scale_pos, Note(abs_note, int(parts.group(3))))
             if pair in result:
-                raise ValueError('Duplicate note {} in initial notes.'.format(init_note))
+                raise ValueError('Duplicate note {} in {} notes.'.format(init_note,
+                                                                         source.lower()))
             else:
                 result.add(pair)
 
         min_note = min(result, key=lambda pair: pair.note_repr.abs_pos)
-        if min_note.note_repr.semi_pos != init_model_chord.get_base_with_inv().semi_pos:
-            raise ValueError('Initial notes are not in inversion: {}.'.format(
-                init_model_chord.inversion or 'ROOT'
+        base_semi = init_model_chord.get_base_with_inv().semi_pos
+        if check_inv and min_note.note_repr.semi_pos != base_semi:
+            raise ValueError('{} notes are not in inversion: {}.'.format(
+                source, init_model_chord.inversion or 'ROOT'
             ))
 
+        # Given notes are taken as they are, so the ranges that every later voicing is
+        #  held to are checked here rather than surfacing as an unreachable first step
+        voice_ranges = VoicesWithinRangeRule.get_voice_ranges(get_config()['voice_count'])
+        if voice_ranges is not None:
+            pairs = sorted(result, key=lambda pair: pair.note_repr.abs_pos)
+            for voice, (pair, voice_range) in enumerate(zip(pairs, voice_ranges)):
+                if not VoicesWithinRangeRule._is_within_range(pair.note_repr.abs_pos,
+                                                              voice_range):
+                    raise ValueError('{} note {}{}: not within the range of voice {} '
+                                     '(counting up from the lowest).'.format(
+                                         source, pair.note_repr.note_name,
+                                         pair.note_repr.octave, voice + 1
+                                     ))
+
         return result
 
-    def transition_chords(self, chord_seq: List[Chord],
-                          init_notes: List[str]) -> List[SATBSequence]:
+    def _get_reusable_layers(self, init_chord: SATBChord, chord_seq: List[Chord]):
+        # Layers of the previous solve are reusable up to the first edited formula, and
+        #  its tail is reusable once the recomputed frontier matches the old one again.
+        # The old layers travel with the resync point, so another thread replacing the
+        #  cache during this solve cannot mix two solves' layers.
+        cache = self.frontier_cache
+        if (
+            cache is None or cache.init_key != init_chord._key() or
+            cache.config != get_config()
+        ):
+            return [], None
+        formula_names = [chord.formula_name for chord in chord_seq]
+        max_common = min(len(formula_names), len(cache.formula_names))
+        prefix = 0
+        while prefix < max_common and formula_names[prefix] == cache.formula_names[prefix]:
+            prefix += 1
+        # The tail may overlap the prefix, as when a formula is repeated: only the
+        #  formulas after a frontier decide whether it can be resynced
+        suffix = 0
+        while (
+            suffix < max_common and
+            formula_names[-1 - suffix] == cache.formula_names[-1 - suffix]
+        ):
+            suffix += 1
+        return cache.layers[:prefix], (len(formula_names) - suffix - 1,
+                                       len(cache.formula_names) - len(formula_names),
+                                       cache.layers)
+
+    def _matches_old_layer(self, layer: Dict[Tuple, FrontierEntry], resync,
+                           step: int) -> bool:
+        # resync[0] is the last edited step. Its frontier holds voicings of the edited
+        #  formula, and the transitions out of a voicing depend on its formula, so
+        #  frontiers are only compared from the first unedited step on.
+        if resync is not None and step > resync[0]:
+            old_layer = resync[2][step + resync[1]]
+            return (
+                len(layer) == len(old_layer) and
+                all(key in old_layer and old_layer[key].cost == entry.cost
+                    for key, entry in layer.items())
+            )
+        return False
+
+    def _get_pinned_chords(self, chord_seq: List[Chord],
+                           pins: Dict[int, List[str]]) -> Dict[int, SATBChord]:
+        pinned = {}
+        for step, notes in (pins or {}).items():
+            assert 0 < step < len(chord_seq), 'Chord {} cannot be pinned'.format(step + 1)
+            # Without include_inv, later chords may be voiced in any inversion
+            pinned[step] = SATBChord(chord_seq[step], self._infer_init_note_pos(
+                notes, chord_seq[step], 'Pinned', get_config()['include_inv']
+            ))
+            # Unlike the initial notes, a pinned voicing is transitioned into, so it has
+            #  to be spaced like every voicing the rules allow
+            positions = PinnedSearch.get_positions(pinned[step])
+            if any(upper - lower > 12 for lower, upper in zip(positions, positions[1:])):
+                raise ValueError('Pinned notes of {}: adjacent voices are more than an octave '
+                                 'apart.'.format(chord_seq[step].formula_name))
+        return pinned
+
+    def _get_step_names(self, chord_seq: List[Chord],
+                        pinned: Dict[int, SATBChord]) -> List[str]:
+        # Pinned voicings are part of what identifies a solve
+        return [chord.formula_name + (' = ' + ' '.join(
+            note.note_name + str(note.octave) for note in pinned[step]._key()
+        ) if step in pinned else '') for step, chord in enumerate(chord_seq)]
+
+    def _get_checkpoint(self, init_chord: SATBChord,
+                        step_names: List[str]) -> Optional[FrontierCheckpoint]:
+        if get_config()['checkpoint_dir'] is None:
+            return None
+        fingerprint = get_solve_fingerprint(
+            [note.note_name + str(note.octave) for note in init_chord._key()],
+            step_names,
+            get_config()
+        )
+        return FrontierCheckpoint(get_config()['checkpoint_dir'], fingerprint,
+                                  get_config()['checkpoint_interval'])
+
+    def transition_chords(self, chord_seq: List[Chord], init_notes: List[str],
+                          pins: Dict[int, List[str]] = None) -> List[SATBSequence]:
         """
         Consumes list of chord formulae and initial condition and produces, without
         user intervention, the optimal SATB transition sequences.
+
+        The per-step frontiers are kept, so solving an edited version of the previous
+        template only recomputes the steps affected by the edit.
+
+        Pins map chord indices to voicings (as initial notes) that every solution must
+        pass through. The search meets in the middle: it goes back from each pinned
+        voicing while that is cheaper than going forward, and forward only from
+        configurations that can still reach it.
         """
+        t0 = perf_counter_ns()
         chord_seq = list(chord_seq)
         assert len(chord_seq) >= 1, 'No chord formulas were specified in template'
-        init_notes = self._infer_init_note_pos(init_notes, chord_seq[0])
+        init_chord = SATBChord(chord_seq[0], self._infer_init_note_pos(init_notes, chord_seq[0]))
+        pinned = self._get_pinned_chords(chord_seq, pins)
+        # Reject hopeless progressions before any search
+        self.feasibility_checker.check(chord_seq, init_chord.key_pos_pairs)
+        pinned_search = PinnedSearch(self, chord_seq, pinned) if pinned else None
 
-        queued_seqs = [SATBSequence().add_satb_chord(
-            SATBChord(chord_seq[0], init_notes), 0
-        )]
-        for i in range(1, len(chord_seq)):
-            next_seqs = []
-
-            # For each queued sequence, find optimal transitions
-            for cur_seq in queued_seqs:
-                # Find NotePosPair and transition cost solutions of target sequence
-                results, tr_cost = self.find_optimal_transition(
-                    cur_seq.most_recent_chord,
-                    SATBChord(chord_seq[i], None)
-                )
-                # Convert NotePosPairs to SATBChord representation
-                results = [SATBChord(chord_seq[i], result) for result in results]
-                # Each new SATBChord branches off target sequence
-                new_seqs = [deepcopy(cur_seq).add_satb_chord(satb_chord, tr_cost)
-                            for satb_chord in results]
-                # Add each new branch to queued sequences
-                next_seqs.extend(new_seqs)
-            # If all queued sequences are unable to find an optimal transition, then failure
-            if len(next_seqs) == 0:
+        # Frontiers pruned towards pins cannot be reused by other templates
+        if pinned:
+            layers, resync = [], None
+        else:
+            layers, resync = self._get_reusable_layers(init_chord, chord_seq)
+        step_names = self._get_step_names(chord_seq, pinned)
+        checkpoint = self._get_checkpoint(init_chord, step_names)
+        if len(layers) == 0 and checkpoint is not None:
+            layers = checkpoint.load(chord_seq)
+        workers = get_config()['segment_workers']
+        # A trace only records the searches of this process
+        trace = get_search_trace()
+        if len(layers) == 0 and checkpoint is None and trace is None and pinned and workers != 1:
+            layers = self._solve_segments(chord_seq, init_chord, pinned, workers)
+        if len(layers) == 0:
+            layers = [{init_chord._key(): FrontierEntry(init_chord, 0, [])}]
+        self._extend_layers(layers, chord_seq, 0, len(chord_seq), pinned_search, resync,
+                            checkpoint)
+
+        if checkpoint is not None:
+            checkpoint.clear()
+        self.frontier_cache = None if pinned else FrontierCache(
+            init_chord._key(), [chord.formula_name for chord in chord_seq],
+            dict(get_config()), layers
+        )
+        if trace is not None:
+            trace.record_solve(step_names, layers, perf_counter_ns() - t0)
+        # At the end, find globally optimal sequences (lowest cost)
+        return self._get_abs_min_cost_seqs(layers)
+
+    def _extend_layers(self, layers: List[Dict[Tuple, FrontierEntry]], chord_seq: List[Chord],
+                       start: int, stop: int, pinned_search: Optional[PinnedSearch],
+                       resync=None, checkpoint: Optional[FrontierCheckpoint] = None) -> None:
+        # Layers hold the frontiers of the steps from start on, and are extended up to
+        #  (not including) the step stop
+        while start + len(layers) < stop:
+            i = start + len(layers)
+            # Once the frontier before an unedited tail matches the previous solve,
+            #  every following frontier is identical to the previous one as well
+            if self._matches_old_layer(layers[-1], resync, i - 1):
+                layers.extend(resync[2][i + resync[1]:])
+                break
+            # At each transition step, aggregate configurations that arrive at the same
+            #  configuration and keep the ones with lowest sequence cost.
+            # Meet in the middle: search back from the next pinned voicing for as long
+            #  as that tries fewer voicings than going forward from this frontier
+            if pinned_search is not None:
+                pinned_search.search_back(i, len(layers[-1]))
+            layers.append(self._advance_frontier(layers[-1], chord_seq[i], pinned_search, i))
+            # If all frontier configurations are unable to find an optimal transition,
+            #  then failure
+            if (
+                len(layers[-1]) == 0 and pinned_search is not None and
+                pinned_search.get_next_pin(i) is not None
+            ):
+                raise UnableToTransitionError(pinned_search.get_unreachable_message(i))
+            if len(layers[-1]) == 0:
                 raise UnableToTransitionError('Unable to transition between: {} and {}'.format(
                     chord_seq[i - 1].formula_name, chord_seq[i].formula_name
                 ))
-            # At an intermediate transition step, aggregate sequences that arrive at
-            #  the same configuration and choose the ones with lowest sequence cost.
-            #  Otherwise, at the end, find globally optimal sequences (lowest cost).
-            if i < len(chord_seq) - 1:
-                queued_seqs = self._get_agg_min_cost_seqs(next_seqs)
-            else:
-                queued_seqs = self._get_abs_min_cost_seqs(next_seqs)
+            if checkpoint is not None:
+                checkpoint.save(layers)
+
+    def _solve_segments(self, chord_seq: List[Chord], init_chord: SATBChord,
+                        pinned: Dict[int, SATBChord],
+                        workers: Optional[int]) -> List[Dict[Tuple, FrontierEntry]]:
+        # A pinned voicing is the only configuration of its step, so the stretches
+        #  between pins are solved independently, in worker processes, and joined by
+        #  adding up costs. Every frontier is the one a solve in turn would find.
+        anchors = [0] + sorted(pinned)
+        stops = [pin + 1 for pin in sorted(pinned)] + [len(chord_seq)]
+        # A pinned last chord leaves no stretch after it
+        segments = [(anchor, stop) for anchor, stop in zip(anchors, stops) if stop - anchor > 1]
+        if len(segments) <= 1:
+            return []
+        from concurrent.futures import ProcessPoolExecutor
 
-        return queued_seqs
+        # Only known settings, as workers apply them as overrides
+        config = {key: value for key, value in get_config().items() if key in DEFAULTS}
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = [executor.submit(_solve_segment, chord_seq, pinned,
+                                       init_chord if anchor == 0 else pinned[anchor],
+                                       anchor, stop, config)
+                       for anchor, stop in segments]
+            segment_layers = [future.result() for future in futures]
+        layers = segment_layers[0]
+        for segment in segment_layers[1:]:
+            # The segment starts from the pinned voicing the previous one ends with
+            offset = next(iter(layers[-1].values())).cost
+            layers.extend({key: FrontierEntry(entry.chord, entry.cost + offset, entry.back_ptrs)
+                           for key, entry in layer.items()}
+                          for layer in segment[1:])
+        return layers
 
-    def user_transition_chords(self, chord_seq: List[Chord],
-                               init_notes: List[str]) -> List[SATBSequence]:
+    def transition_chords_batch(
+        self, batch: List[Tuple[List[Chord], List[str]]]
+    ) -> List[List[SATBSequence]]:
+        """
+        Solves a batch of (chord formulae, initial condition) progressions, in the order
+        given. Progressions sharing an initial condition and first formulae share their
+        frontiers up to where they diverge, so each distinct prefix is solved once.
+        """
+        # Build a trie over (initial configuration, formula names)
+        roots = {}
+        for idx, (chord_seq, init_notes) in enumerate(batch):
+            assert len(chord_seq) >= 1, 'No chord formulas were specified in template'
+            init_chord = SATBChord(chord_seq[0],
+                                   self._infer_init_note_pos(init_notes, chord_seq[0]))
+            self.feasibility_checker.check(chord_seq, init_chord.key_pos_pairs)
+            root_key = (init_chord._key(), chord_seq[0].formula_name)
+            if root_key not in roots:
+                roots[root_key] = (init_chord, PrefixNode(chord_seq[0]))
+            node = roots[root_key][1]
+            for chord in chord_seq[1:]:
+                if chord.formula_name not in node.children:
+                    node.children[chord.formula_name] = PrefixNode(chord)
+                node = node.children[chord.formula_name]
+            node.progression_idxs.append(idx)
+
+        # Depth-first over each trie, keeping only the frontiers along the current path
+        solutions = [None] * len(batch)
+        for init_chord, root in roots.values():
+            layers, stack = [], [(root, 0, None)]
+            while len(stack) > 0:
+                node, depth, prev_formula = stack.pop()
+                del layers[depth:]
+                if depth == 0:
+                    layers.append({init_chord._key(): FrontierEntry(init_chord, 0, [])})
+                else:
+                    layers.append(self._advance_frontier(layers[-1], node.chord_formula))
+                    if len(layers[-1]) == 0:
+                        raise UnableToTransitionError(
+                            'Unable to transition between: {} and {}'.format(
+                                prev_formula.formula_name, node.chord_formula.formula_name
+                            )
+                        )
+                for idx in node.progression_idxs:
+                    solutions[idx] = self._get_abs_min_cost_seqs(layers)
+                stack.extend((child, depth + 1, node.chord_formula)
+                             for child in node.children.values())
+        return solutions
+
+    def _expand_node(self, node: ChordNode, next_chord_formula: Chord,
+                     pinned_search: PinnedSearch = None, step: int = None) -> List[ChordNode]:
+        # Shared by the interactive loop and the lookahead worker; whichever reaches
+        #  the node first computes its transitions while the other waits on the lock.
+        with node.lock:
+            if node.next_nodes is None:
+                # Options that cannot reach a later pinned voicing are not offered
+                if pinned_search is not None:
+                    pinned_search.search_back(step)
+                    transitions = pinned_search.get_transitions(node.chord, step)
+                else:
+                    transitions = self.get_transitions(node.chord, next_chord_formula)
+                # Optimal transitions are assigned to prevent further recomputation
+                node.next_nodes = [ChordNode(node, chord, None, tr_cost)
+                                   for chord, tr_cost in transitions]
+        return node.next_nodes
+
+    def _lookahead(self, node: ChordNode, seq_idx: int, chord_seq: List[Chord],
+                   pinned_search: Optional[PinnedSearch], cancelled: Event) -> None:
+        # Breadth-first expansion of the options currently offered to the user (and
+        #  optionally their options), so the next prompt appears without delay.
+        level = [(child, seq_idx + 1) for child in node.next_nodes]
+        for _ in range(get_config()['lookahead_depth']):
+            next_level = []
+            for child, idx in level:
+                if cancelled.is_set():
+                    return
+                if idx < len(chord_seq) - 1:
+                    next_level.extend((grandchild, idx + 1) for grandchild in
+                                      self._expand_node(child, chord_seq[idx + 1],
+                                                        pinned_search, idx + 1))
+            level = next_level
+
+    def user_transition_chords(self, chord_seq: List[Chord], init_notes: List[str],
+                               pins: Dict[int, List[str]] = None) -> List[SATBSequence]:
         """
         Consumes list of chord formulae and initial condition and produces, with
         user intervention, the user-decided best SATB transition sequence.
         """
+        from concurrent.futures import ThreadPoolExecutor
+
         chord_seq = list(chord_seq)
         assert len(chord_seq) >= 1, 'No chord formulas were specified in template'
         init_notes = self._infer_init_note_pos(init_notes, chord_seq[0])
+        pinned = self._get_pinned_chords(chord_seq, pins)
+        self.feasibility_checker.check(chord_seq, init_notes)
+        pinned_search = PinnedSearch(self, chord_seq, pinned) if pinned else None
 
         seq_idx = 0
         cur_node = ChordNode(None, SATBChord(chord_seq[seq_idx], init_notes), None, 0)
-        while seq_idx < len(chord_seq) - 1:
-            # If current node has not computed its optimal transitions, do compute
-            if cur_node.next_nodes is None:
-                # Find NotePosPair and transition cost solutions of target chord
-                results, tr_cost = self.find_optimal_transition(
-                    cur_node.chord, SATBChord(chord_seq[seq_idx + 1], None)
-                )
-                # Convert NotePosPairs to SATBChord representation
-                results = [SATBChord(chord_seq[seq_idx + 1], result) for result in results]
-                # Optimal transitions are assigned to prevent further recomputation
-                cur_node.next_nodes = [ChordNode(cur_node, chord, None, tr_cost)
-                                       for chord in results]
+        with ThreadPoolExecutor(max_workers=1) as lookahead_executor:
+            while seq_idx < len(chord_seq) - 1:
+                # If current node has not computed its optimal transitions, do compute
+                #  (or wait for the lookahead worker to finish doing so)
+                self._expand_node(cur_node, chord_seq[seq_idx + 1], pinned_search, seq_idx + 1)
                 # If current node is unable to find any optimal transitions, then failure
+                if (
+                    len(cur_node.next_nodes) == 0 and pinned_search is not None and
+                    pinned_search.get_next_pin(seq_idx + 1) is not None
+                ):
+                    raise UnableToTransitionError(
+                        pinned_search.get_unreachable_message(seq_idx + 1)
+                    )
                 if len(cur_node.next_nodes) == 0:
                     raise UnableToTransitionError('Unable to transition between: {} and {}'.format(
                         chord_seq[seq_idx].formula_name, chord_seq[seq_idx + 1].formula_name
                     ))
 
-            # Given the current node and its optimal transitions, prompt user to choose
-            #  either to step back in the sequence or choose a transition option
-            action, choice = SolutionInterface().report_intermed_solutions(cur_node.chord,
-                                                                           cur_node.next_nodes)
-            # Forward movement: user has chosen a transition option
-            if action == 1:
-                cur_node = cur_node.next_nodes[choice]
-                seq_idx += 1
-            # Backward movement: step back in sequence and revisit previous choices
-            elif action == -1:
-                if cur_node.prev_node is None:
-                    print(colored('Cannot step back in sequence any further!!!', 'red'))
-                else:
-                    cur_node = cur_node.prev_node
-                    seq_idx -= 1
+                # Precompute the transitions of every offered option while the user decides
+                cancelled = Event()
+                lookahead_executor.submit(copy_context().run, self._lookahead,
+                                          cur_node, seq_idx, chord_seq, pinned_search, cancelled)
+
+                # Given the current node and its optimal transitions, prompt user to choose
+                #  either to step back in the sequence or choose a transition option
+                try:
+                    action, choice = SolutionInterface().report_intermed_solutions(
+                        cur_node.chord, cur_node.next_nodes
+                    )
+                finally:
+                    # Stale lookahead work is abandoned, also when the prompt is
+                    #  interrupted; finished expansions stay in the tree
+                    cancelled.set()
+                # Forward movement: user has chosen a transition option
+                if action == 1:
+                    cur_node = cur_node.next_nodes[choice]
+                    seq_idx += 1
+                # Backward movement: step back in sequence and revisit previous choices
+                elif action == -1:
+                    if cur_node.prev_node is None:
+                        print(colored('Cannot step back in sequence any further!!!', 'red'))
+                    else:
+                        cur_node = cur_node.prev_node
+                        seq_idx -= 1
 
         # Backwards traverse transition tree to generate single solution sequence
         full_seq = SATBSequence()
@@ -257,3 +680,15 @@ class ChordTransitioner:
             cur_node = cur_node.prev_node
         full_seq.sequence.reverse()
         return [full_seq]
+
+
+def _solve_segment(chord_seq: List[Chord], pinned: Dict[int, SATBChord], anchor_chord: SATBChord,
+                   start: int, stop: int, config: Dict) -> List[Dict[Tuple, FrontierEntry]]:
+    # Runs in a worker process: frontiers of the steps from start, voiced as the given
+    #  initial or pinned voicing, up to stop
+    with config_overrides(**config):
+        transitioner = ChordTransitioner()
+        layers = [{anchor_chord._key(): FrontierEntry(anchor_chord, 0, [])}]
+        transitioner._extend_layers(layers, chord_seq, start, stop,
+                                    PinnedSearch(transitioner, chord_seq, pinned))
+        return layers
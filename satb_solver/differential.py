@@ -0,0 +1,194 @@
+import json
+import os
+import random
+from typing import Any, Dict, List, Optional, Tuple
+
+from model.chord_formulas import Chord
+from model.exceptions import BaseException as SolverError
+from model.exceptions import InfeasibleProgressionError
+from model.solver_config import config_overrides, get_config
+from model.transition_rules import VoicesWithinRangeRule
+from satb_solver.chord_transitioner import ChordTransitioner
+from satb_solver.feasibility import FeasibilityChecker
+from satb_solver.template_parser import TemplateParser
+from satb_solver.voicing_index import VoicingIndex
+
+# Solved: ('solved', cost, voicing sequences). Failed: ('error', exception name)
+Outcome = Tuple
+
+
+class ProgressionGenerator:
+    """
+    Random templates built from the parts of TemplateParser.formula_matcher, each
+    with a random initial voicing of its first chord. Combinations the parser or the
+    chord models reject are drawn again.
+    """
+    # Parts are repeated to weigh them; extended chords are kept rarer, as they cost
+    #  the reference engine the most with many voices
+    ROOTS = [nat + accid for nat in 'ABCDEFG' for accid in ('', 'b', '#')]
+    TRIADS = ['maj', 'maj', 'min', 'min', 'aug', 'dim', '']
+    COMPOUNDS = ['', '', '', '', '7', '7', '9', '11', '13', 'b9', '#9', '#11', 'b13']
+    SUSTAINED = ['', '', '', '', '', '-sus', '-sus2', '-sus4']
+    MODIFICATIONS = ['', '', '', '', '', '', '-b5', '-#5', '-b9', '-(b5,b9)', '-(#5,#9)']
+    INVERSIONS = ['', '', '_6', '_64', '_65', '_43', '_42']
+    MAX_DRAWS = 1000
+    EXTEND_DRAWS = 50
+
+    def __init__(self, rng: random.Random, template_parser: TemplateParser):
+        self.rng = rng
+        self.template_parser = template_parser
+        self.feasibility_checker = FeasibilityChecker()
+
+    def _draw_formula(self) -> str:
+        choice = self.rng.choice
+        return (choice(self.ROOTS) + choice(self.TRIADS) + choice(self.COMPOUNDS) +
+                choice(self.SUSTAINED) + choice(self.MODIFICATIONS) + choice(self.INVERSIONS))
+
+    def _is_usable(self, formula: str) -> bool:
+        try:
+            chord_formula = self.template_parser.get_composition(formula)
+            chord_formula.get_base_with_inv()
+        except (SolverError, AssertionError, ValueError, KeyError, TypeError):
+            return False
+        # Positions alone cannot tell enharmonically equal chord notes apart
+        semis = {pair.note_repr.semi_pos for pair in chord_formula.get_key_pos_pairs()}
+        return len(semis) == chord_formula.note_count()
+
+    def random_formula(self) -> str:
+        for _ in range(self.MAX_DRAWS):
+            formula = self._draw_formula()
+            if self._is_usable(formula):
+                return formula
+        raise RuntimeError('No usable chord formula in {} draws'.format(self.MAX_DRAWS))
+
+    def random_init_cond(self, chord_formula: Chord) -> Optional[str]:
+        voice_ranges = VoicesWithinRangeRule.get_voice_ranges(get_config()['voice_count'])
+        voicings = list(VoicingIndex.get(chord_formula).iter_voicings(voice_ranges))
+        if len(voicings) == 0:
+            return None
+        names_by_semi = {pair.note_repr.semi_pos: pair.note_repr.note_name
+                         for pair in chord_formula.get_key_pos_pairs()}
+        return ' '.join(names_by_semi[pos % 12] + str(pos // 12)
+                        for pos in self.rng.choice(voicings))
+
+    def _extend(self, template: List[str]) -> bool:
+        # Chords are drawn until the template still passes the feasibility checks, as
+        #  most random successions cannot be voiced at all
+        chord_seq = list(self.template_parser.parse_template(template))
+        for _ in range(self.EXTEND_DRAWS):
+            formula = self.random_formula()
+            try:
+                self.feasibility_checker.check(
+                    chord_seq + [self.template_parser.get_composition(formula)]
+                )
+            except InfeasibleProgressionError:
+                continue
+            template.append(formula)
+            return True
+        return False
+
+    def random_progression(self, min_length: int, max_length: int) -> Tuple[str, List[str]]:
+        for _ in range(self.MAX_DRAWS):
+            template = [self.random_formula()]
+            length = self.rng.randint(min_length, max_length)
+            while len(template) < length and self._extend(template):
+                pass
+            if len(template) < min_length:
+                continue
+            init_cond = self.random_init_cond(self.template_parser.get_composition(template[0]))
+            if init_cond is not None:
+                return init_cond, template
+        raise RuntimeError('No voiceable progression in {} draws'.format(self.MAX_DRAWS))
+
+
+class DifferentialTester:
+    """
+    Solves the same progressions with reference and candidate settings (such as
+    engine=bf and engine=indexed) and compares the optimal cost and the set of optimal
+    voicing sequences. Solutions are compared as sets, as engines may list ties in
+    any order. Mismatching progressions are shortened to a minimal reproducer.
+    """
+
+    def __init__(self, reference: Dict[str, Any], candidate: Dict[str, Any]):
+        self.reference = reference
+        self.candidate = candidate
+        self.template_parser = TemplateParser()
+
+    def run(self, init_cond: str, template: List[str], settings: Dict[str, Any]) -> Outcome:
+        with config_overrides(**settings):
+            # A new transitioner for every run, so nothing is reused between them
+            chord_transitioner = ChordTransitioner()
+            try:
+                solutions = chord_transitioner.transition_chords(
+                    self.template_parser.parse_template(template),
+                    self.template_parser.parse_init_cond(init_cond)
+                )
+            except (SolverError, AssertionError, ValueError) as e:
+                return ('error', type(e).__name__)
+        # Voicings lowest voice first
+        return ('solved', solutions[0].seq_cost if solutions else None, frozenset(
+            tuple(tuple((note.note_name, note.octave)
+                        for note in sorted((pair.note_repr for pair in chord.key_pos_pairs),
+                                           key=lambda note: (note.abs_pos, note.note_name)))
+                  for chord in satb_seq.sequence)
+            for satb_seq in solutions
+        ))
+
+    def compare(self, init_cond: str, template: List[str],
+                settings: Dict[str, Any]) -> Tuple[Outcome, Outcome]:
+        ref = self.run(init_cond, template, {**settings, **self.reference})
+        cand = self.run(init_cond, template, {**settings, **self.candidate})
+        return ref, cand
+
+    def is_mismatch(self, init_cond: str, template: List[str], settings: Dict[str, Any]) -> bool:
+        ref, cand = self.compare(init_cond, template, settings)
+        return ref != cand
+
+    def minimize(self, init_cond: str, template: List[str],
+                 settings: Dict[str, Any]) -> List[str]:
+        # The first chord carries the initial voicing, so it always stays. The template
+        #  is cut to its shortest mismatching prefix, then interior chords are dropped
+        #  one at a time for as long as the mismatch remains.
+        for length in range(2, len(template)):
+            if self.is_mismatch(init_cond, template[:length], settings):
+                template = template[:length]
+                break
+        idx = len(template) - 2
+        while idx >= 1:
+            shorter = template[:idx] + template[idx + 1:]
+            if self.is_mismatch(init_cond, shorter, settings):
+                template = shorter
+            idx -= 1
+        return template
+
+    def describe(self, outcome: Outcome) -> Dict[str, Any]:
+        if outcome[0] == 'error':
+            return {'error': outcome[1]}
+        return {'cost': outcome[1], 'solution_count': len(outcome[2]),
+                'solutions': sorted([[' '.join(name + str(octave) for name, octave in chord)
+                                      for chord in seq] for seq in outcome[2]])}
+
+    def write_reproducer(self, path: str, init_cond: str, template: List[str],
+                         settings: Dict[str, Any], outcomes: Tuple[Outcome, Outcome],
+                         original: List[str] = None) -> None:
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with open(path, 'w') as rf:
+            json.dump({
+                'init': init_cond,
+                'formulas': template,
+                'settings': settings,
+                'reference': self.reference,
+                'candidate': self.candidate,
+                'reference_outcome': self.describe(outcomes[0]),
+                'candidate_outcome': self.describe(outcomes[1]),
+                'original_formulas': original or template
+            }, rf, indent=2)
+            rf.write('\n')
+
+    @classmethod
+    def read_reproducer(cls, path: str) -> Tuple['DifferentialTester', str, List[str],
+                                                 Dict[str, Any]]:
+        with open(path, 'r') as rf:
+            entry = json.load(rf)
+        return (cls(entry['reference'], entry['candidate']), entry['init'],
+                entry['formulas'], entry['settings'])
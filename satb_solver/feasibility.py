@@ -0,0 +1,102 @@
+from typing import List, Optional, Set
+
+from model.chord_formulas import Chord
+from model.dt_def import NotePosPair, TransitionContext
+from model.exceptions import InfeasibleProgressionError
+from model.satb_elements import SATBChord
+from model.solver_config import get_config
+from model.transition_rules import (AcceptableNoteFrequenciesRule,
+                                    DominantNotesResolvingRule, VoicesWithinRangeRule)
+from satb_solver.voicing_index import VoicingIndex
+
+
+class FeasibilityChecker:
+    """
+    Cheap necessary conditions for a progression to be voiced, checked on the chord
+    formulae alone before any search. A progression failing one of them can never be
+    solved, and is rejected with the rule and chord that block it.
+    """
+
+    def _get_context(self, cur_chord: Chord, next_chord: Chord) -> TransitionContext:
+        return TransitionContext(SATBChord(cur_chord, None), SATBChord(next_chord, None))
+
+    def _fail(self, rule: str, step: int, chord_seq: List[Chord], reason: str) -> None:
+        raise InfeasibleProgressionError(
+            '{} cannot be met at chord {} ({}): {}'.format(
+                rule, step + 1, chord_seq[step].formula_name, reason
+            ), rule, step
+        )
+
+    def _check_frequencies(self, chord_seq: List[Chord], step: int,
+                           context: TransitionContext) -> Set[int]:
+        # Returns the scale positions every voicing of the chord has to contain
+        voice_count = get_config()['voice_count']
+        freq_tol = AcceptableNoteFrequenciesRule.get_freq_tolerances(context)
+        required = sum(freq.min_freq for freq in freq_tol.values())
+        if required > voice_count:
+            self._fail('AcceptableNoteFrequenciesRule', step, chord_seq,
+                       '{} essential notes for {} voices'.format(required, voice_count))
+        available = sum(freq.max_freq for freq in freq_tol.values())
+        if available < voice_count:
+            self._fail('AcceptableNoteFrequenciesRule', step, chord_seq,
+                       'at most {} notes for {} voices'.format(available, voice_count))
+        return {pos for pos, freq in freq_tol.items() if freq.min_freq > 0}
+
+    def _check_voicings(self, chord_seq: List[Chord], step: int) -> None:
+        if not VoicingIndex.exists(chord_seq[step]):
+            self._fail('VoicesNotExceedingOctaveNorCrossingRule', step, chord_seq,
+                       'no voicing keeps adjacent voices within an octave with '
+                       'acceptable note frequencies')
+        voice_ranges = VoicesWithinRangeRule.get_voice_ranges(get_config()['voice_count'])
+        if voice_ranges is not None and not VoicingIndex.exists(chord_seq[step], voice_ranges):
+            self._fail('VoicesWithinRangeRule', step, chord_seq,
+                       'no voicing within the voice ranges keeps adjacent voices within '
+                       'an octave with acceptable note frequencies')
+
+    def _check_init_voicing(self, chord_seq: List[Chord], init_pairs: Set[NotePosPair]) -> None:
+        voice_ranges = VoicesWithinRangeRule.get_voice_ranges(get_config()['voice_count'])
+        if voice_ranges is None:
+            return
+        positions = sorted(pair.note_repr.abs_pos for pair in init_pairs)
+        if not all(VoicesWithinRangeRule._is_within_range(pos, voice_range)
+                   for pos, voice_range in zip(positions, voice_ranges)):
+            self._fail('VoicesWithinRangeRule', 0, chord_seq,
+                       'the initial notes are not within the voice ranges')
+
+    def _check_resolutions(self, chord_seq: List[Chord], step: int, required: Set[int],
+                           context: TransitionContext) -> None:
+        # Every required note with a resolution tolerance must be able to reach a note
+        #  of the next chord
+        tolerances = dict(DominantNotesResolvingRule.SUS_TOL)
+        if DominantNotesResolvingRule.is_dominant(context):
+            tolerances.update(DominantNotesResolvingRule.DOM_TOL)
+        cur_pairs = {pair.scale_pos: pair for pair in chord_seq[step].get_key_pos_pairs()}
+        next_semis = {pair.note_repr.semi_pos for pair in chord_seq[step + 1].get_key_pos_pairs()}
+        for scale_pos in sorted(required & tolerances.keys()):
+            cur_semi = cur_pairs[scale_pos].note_repr.semi_pos
+            if not any((cur_semi + move) % 12 in next_semis for move in tolerances[scale_pos]):
+                self._fail('DominantNotesResolvingRule', step, chord_seq,
+                           '{} cannot resolve into {}'.format(
+                               cur_pairs[scale_pos].note_repr.note_name,
+                               chord_seq[step + 1].formula_name
+                           ))
+
+    def check(self, chord_seq: List[Chord],
+              init_pairs: Optional[Set[NotePosPair]] = None) -> None:
+        """
+        Raises InfeasibleProgressionError when the progression cannot be voiced.
+        """
+        for step in range(len(chord_seq)):
+            if step == 0:
+                # The first voicing is given, so only its notes need to resolve
+                required = set()
+                if init_pairs is not None:
+                    self._check_init_voicing(chord_seq, init_pairs)
+                    required = {pair.scale_pos for pair in init_pairs}
+            else:
+                context = self._get_context(chord_seq[step - 1], chord_seq[step])
+                required = self._check_frequencies(chord_seq, step, context)
+                self._check_voicings(chord_seq, step)
+            if step + 1 < len(chord_seq):
+                self._check_resolutions(chord_seq, step, required,
+                                        self._get_context(chord_seq[step], chord_seq[step + 1]))
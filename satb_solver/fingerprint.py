@@ -0,0 +1,32 @@
+import json
+from typing import Dict, Iterable
+
+# Settings that change which solutions are produced. Settings that only affect
+#  how a solve is carried out or reported do not belong here.
+SOLUTION_CONFIG_KEYS = ('voice_count', 'voice_ranges', 'include_inv', 'max_frontier_entries',
+                        'candidate_window')
+# Raised whenever a change to the rules changes which transitions are optimal, so that
+#  transitions, frontiers and solutions stored before it are not reused.
+#  2: voice ranges are enforced
+RULES_VERSION = 2
+
+
+def get_solve_fingerprint(init_notes: Iterable[str], formula_names: Iterable[str],
+                          config: Dict) -> str:
+    import hashlib
+
+    payload = json.dumps([
+        list(init_notes),
+        list(formula_names),
+        [config.get(key) for key in SOLUTION_CONFIG_KEYS],
+        RULES_VERSION
+    ], separators=(',', ':'))
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def get_config_fingerprint(config: Dict) -> bytes:
+    import hashlib
+
+    payload = json.dumps([[config.get(key) for key in SOLUTION_CONFIG_KEYS], RULES_VERSION],
+                         separators=(',', ':'))
+    return hashlib.sha256(payload.encode()).digest()
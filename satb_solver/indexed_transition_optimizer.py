@@ -0,0 +1,64 @@
+from typing import List, Set, Tuple
+
+from model.dt_def import NotePosPair, Transition
+from model.solver_config import get_config
+from satb_solver.bf_transition_optimizer import BFTransitionOptimizer
+from satb_solver.voicing_index import VoicingIndex
+
+
+class IndexedTransitionOptimizer(BFTransitionOptimizer):
+    """
+    Chooses the next voicing among the VoicingIndex entries of the next chord instead
+    of growing configurations bucket by bucket. Finds the same transitions as
+    BFTransitionOptimizer: the breadth-first matcher succeeds at the first bucket in
+    which a valid configuration exists, so it returns the cheapest valid configurations
+    among those whose largest transition difference is smallest.
+    """
+
+    def __init__(self, prioritized_checker, transition_context, rule_order=None):
+        super(IndexedTransitionOptimizer, self).__init__(prioritized_checker,
+                                                         transition_context, rule_order)
+        self.voicing_index = VoicingIndex.get(transition_context.next_chord_formula)
+
+    def _get_indexed_matchings(self, voice_candidates: List[List[Transition]]):
+        # Walk each voice's candidate transitions down the voicing trie, so only
+        #  candidates that continue an indexed voicing are ever combined
+        def walk(trie, bass, voice, matchings):
+            if voice == len(voice_candidates):
+                yield list(matchings)
+                return
+            for trans in voice_candidates[voice]:
+                subtrie = trie.get(trans.next_abs_pos - bass)
+                if subtrie is not None:
+                    matchings.append(trans)
+                    yield from walk(subtrie, bass, voice + 1, matchings)
+                    matchings.pop()
+
+        for bass_trans in voice_candidates[0]:
+            trie = self.voicing_index.get_trie(bass_trans.next_pair.note_repr.semi_pos)
+            if trie is not None:
+                yield from walk(trie, bass_trans.next_abs_pos, 1, [bass_trans])
+
+    def _get_priority(self, matchings: List[Transition]) -> Tuple[int, int]:
+        return (
+            max(trans.min_diff for trans in matchings),
+            sum(self._get_trans_cost(trans) for trans in matchings)
+        )
+
+    def solve(self) -> Tuple[List[Set[NotePosPair]], int]:
+        voice_candidates = self._get_voice_candidates()
+        if len(voice_candidates) != get_config()['voice_count']:
+            return [], 0
+        ranked = []
+        for matchings in self._get_indexed_matchings(voice_candidates):
+            ranked.append((self._get_priority(matchings), matchings))
+            self._check_frontier_size(len(ranked))
+        ranked.sort(key=lambda ranked_matchings: ranked_matchings[0])
+        best, res = None, []
+        for priority, matchings in ranked:
+            if best is not None and priority != best:
+                break
+            if self._is_valid_matchings(matchings):
+                best = priority
+                res.append({trans.next_pair for trans in matchings})
+        return res, (best[1] if best is not None else 0)
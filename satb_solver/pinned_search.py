@@ -0,0 +1,174 @@
+from itertools import product
+from threading import Lock
+from typing import TYPE_CHECKING, Dict, List, Optional, Tuple
+
+from model.chord_formulas import Chord
+from model.dt_def import NotePosPair, Transition, TransitionContext
+from model.exceptions import UnableToTransitionError
+from model.satb_elements import Note, SATBChord
+from model.solver_config import get_config
+from model.transition_rules import VoicesWithinRangeRule
+from satb_solver.bf_transition_optimizer import BFTransitionOptimizer
+from satb_solver.voicing_index import VoicingIndex
+
+if TYPE_CHECKING:
+    from satb_solver.chord_transitioner import ChordTransitioner
+
+
+class PinnedSearch:
+    """
+    Meet-in-the-middle search towards the voicings some chords are pinned to.
+
+    Backwards from each pinned voicing, the voicings of the chords before it that
+    can still reach it are found, and the forward search only goes on from those.
+    The transition into a pinned voicing only has to follow the rules; it does not
+    have to be among the optimal transitions of the configuration it leaves from.
+    """
+
+    def __init__(self, transitioner: 'ChordTransitioner', chord_seq: List[Chord],
+                 pinned: Dict[int, SATBChord]):
+        self.transitioner = transitioner
+        self.chord_seq = chord_seq
+        self.pinned = pinned
+        self.voice_ranges = VoicesWithinRangeRule.get_voice_ranges(get_config()['voice_count'])
+        # Largest move of a voice in any transition
+        self.max_move = get_config()['candidate_window']
+        # Positions (lowest voice first) of the voicings of a chord that can reach the
+        #  next pinned voicing, by step
+        self.reachable = {}
+        # Transitions found on the way back, by step and configuration they leave from
+        self.transitions = {}
+        self.candidates = {}
+        # The lookahead of interactive solving searches back as well
+        self.lock = Lock()
+
+    @staticmethod
+    def get_positions(satb_chord: SATBChord) -> Tuple[int, ...]:
+        return tuple(sorted(pair.note_repr.abs_pos for pair in satb_chord.key_pos_pairs))
+
+    def get_next_pin(self, step: int) -> Optional[int]:
+        return min((pin for pin in self.pinned if pin >= step), default=None)
+
+    def get_unreachable_message(self, step: int) -> str:
+        pin = self.get_next_pin(step)
+        return 'Unable to reach pinned voicing of {} (chord {}) from {}'.format(
+            self.chord_seq[pin].formula_name, pin + 1, self.chord_seq[step - 1].formula_name
+        )
+
+    def _get_direct_cost(self, cur_chord: SATBChord, pinned_chord: SATBChord) -> Optional[int]:
+        # Voices keep their order, and each moves by at most max_move semitones like in
+        #  any other transition
+        cur_pairs = sorted(cur_chord.key_pos_pairs, key=lambda pair: pair.note_repr.abs_pos)
+        next_pairs = sorted(pinned_chord.key_pos_pairs, key=lambda pair: pair.note_repr.abs_pos)
+        matchings = []
+        for voice, (cur_pair, next_pair) in enumerate(zip(cur_pairs, next_pairs)):
+            diff = abs(next_pair.note_repr.abs_pos - cur_pair.note_repr.abs_pos)
+            if diff > self.max_move:
+                return None
+            # The bass of inverted chords is matched in full, as in the optimizers
+            full = voice == 0 and get_config()['include_inv']
+            matchings.append(Transition(-1 if full else diff, cur_pair, next_pair))
+        context = TransitionContext(cur_chord, pinned_chord)
+        for validator in BFTransitionOptimizer.RULES:
+            if not validator.validate(matchings, context):
+                return None
+        return sum(trans.abs_pos_diff for trans in matchings)
+
+    def get_transitions(self, cur_chord: SATBChord, step: int) -> List[Tuple[SATBChord, int]]:
+        """
+        Transitions, with their costs, from a voicing of the chord before the given
+        step to voicings of its chord that can still reach the next pinned voicing.
+        """
+        if step in self.pinned:
+            cost = self._get_direct_cost(cur_chord, self.pinned[step])
+            return [] if cost is None else [(self.pinned[step], cost)]
+        transitions = self.transitions.get((step, cur_chord._key()))
+        if transitions is not None:
+            return transitions
+        transitions = self.transitioner.get_transitions(cur_chord, self.chord_seq[step])
+        reachable = self.reachable.get(step)
+        if reachable is not None:
+            return [(chord, cost) for chord, cost in transitions
+                    if self.get_positions(chord) in reachable]
+        # Not searched back this far (yet): every voice is still to be within max_move
+        #  semitones per transition left of the pinned voicing
+        pin = self.get_next_pin(step)
+        if pin is None:
+            return transitions
+        max_move = self.max_move * (pin - step)
+        pinned_positions = self.get_positions(self.pinned[pin])
+        return [(chord, cost) for chord, cost in transitions
+                if all(abs(pos - pinned_pos) <= max_move for pos, pinned_pos
+                       in zip(self.get_positions(chord), pinned_positions))]
+
+    def _get_targets(self, step: int) -> List[Tuple[int, ...]]:
+        if step in self.pinned:
+            return [self.get_positions(self.pinned[step])]
+        return list(self.reachable[step])
+
+    def _get_candidates(self, step: int) -> List[SATBChord]:
+        # Only voicings with every voice within max_move semitones of some target can
+        #  reach one
+        if step in self.candidates:
+            return self.candidates[step]
+        targets = self._get_targets(step + 1)
+        bounds = [(min(target[voice] for target in targets) - self.max_move,
+                   max(target[voice] for target in targets) + self.max_move)
+                  for voice in range(get_config()['voice_count'])]
+        if self.voice_ranges is not None:
+            bounds = [(max(low, voice_low), min(high, voice_high))
+                      for (low, high), (voice_low, voice_high) in zip(bounds, self.voice_ranges)]
+        chord_formula = self.chord_seq[step]
+        pairs_by_semi = {}
+        for pair in chord_formula.get_key_pos_pairs():
+            pairs_by_semi.setdefault(pair.note_repr.semi_pos, []).append(pair)
+        candidates = []
+        for positions in VoicingIndex.get(chord_formula).iter_voicings(bounds):
+            # Enharmonically equal chord notes give a voicing per spelling
+            for pairs in product(*(
+                [NotePosPair(pair.scale_pos,
+                             Note(pair.note_repr, (pos - pair.note_repr.semi_pos) // 12))
+                 for pair in pairs_by_semi[pos % 12]]
+                for pos in positions
+            )):
+                candidates.append(SATBChord(chord_formula, set(pairs)))
+        self.candidates[step] = candidates
+        return candidates
+
+    def _search_back_step(self, step: int) -> None:
+        reachable = set()
+        for candidate in self._get_candidates(step):
+            transitions = self.get_transitions(candidate, step + 1)
+            if len(transitions) == 0:
+                continue
+            if step + 1 not in self.pinned:
+                self.transitions[(step + 1, candidate._key())] = transitions
+            reachable.add(self.get_positions(candidate))
+        del self.candidates[step]
+        if len(reachable) == 0:
+            raise UnableToTransitionError(self.get_unreachable_message(step + 1))
+        self.reachable[step] = reachable
+
+    def search_back(self, step: int, max_candidates: Optional[int] = None) -> None:
+        """
+        Searches backwards from the next pinned voicing, down to the chord at the
+        given step at most. Given max_candidates, the search stops at the first chord
+        with more voicings to try than that, so the forward search meets it there.
+        """
+        pin = self.get_next_pin(step)
+        if pin is None:
+            return
+        with self.lock:
+            low = pin
+            while low - 1 in self.reachable:
+                low -= 1
+            while low - 1 >= step:
+                # Voicings next to the pin are only checked against the rules, which is
+                #  cheap enough to always do
+                if (
+                    max_candidates is not None and low < pin and
+                    len(self._get_candidates(low - 1)) > max_candidates
+                ):
+                    break
+                self._search_back_step(low - 1)
+                low -= 1
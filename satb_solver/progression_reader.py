@@ -0,0 +1,101 @@
+import json
+import os
+from typing import Any, Dict, Iterator, List
+
+from model.dt_def import Progression
+from model.exceptions import ExtensionError, InvalidProgressionError
+from model.solver_config import parse_config_overrides
+
+
+class ProgressionReader:
+    """
+    Streams the progressions of a source file, one at a time, so that memory does not
+    grow with the number of progressions in it. Two formats are read:
+      .txt    blocks separated by blank lines. Each block is optional option lines
+              ("@ voice_count=5 include_inv=false"), then the initial condition, then
+              one chord formula per line. A file with a single block is the original
+              single-progression format.
+      .jsonl  one progression per line, as {"init": "C3 G3 E4 C5", "formulas": [...]}
+              with optional "voice_count" and "include_inv" keys.
+    """
+    EXTENSIONS = ('.txt', '.jsonl')
+    # Settings a single progression may override
+    OVERRIDABLE = ('voice_count', 'include_inv')
+    OPTION_PREFIX = '@'
+
+    def __init__(self, source_filepath: str):
+        self.source_filepath = source_filepath
+
+    def _check_overrides(self, overrides: Dict[str, Any], line_no: int) -> Dict[str, Any]:
+        for key in overrides:
+            if key not in self.OVERRIDABLE:
+                raise InvalidProgressionError(
+                    'Setting {} cannot be overridden per progression (line {})'.format(
+                        key, line_no
+                    )
+                )
+        return overrides
+
+    def _make_progression(self, entry_idx: int, line_no: int, lines: List[str],
+                          overrides: Dict[str, Any]) -> Progression:
+        if len(lines) == 0:
+            raise InvalidProgressionError(
+                'Progression at line {} has no initial condition'.format(line_no)
+            )
+        return Progression(entry_idx, line_no, lines[0], lines[1:], overrides)
+
+    def _read_blocks(self, sf) -> Iterator[Progression]:
+        entry_idx, start, lines, overrides = 0, None, [], {}
+        for line_no, line in enumerate(sf, 1):
+            line = line.strip()
+            if line == '':
+                if start is not None:
+                    yield self._make_progression(entry_idx, start, lines, overrides)
+                    entry_idx, start, lines, overrides = entry_idx + 1, None, [], {}
+                continue
+            if start is None:
+                start = line_no
+            if line.startswith(self.OPTION_PREFIX) and len(lines) == 0:
+                try:
+                    options = parse_config_overrides(line[len(self.OPTION_PREFIX):].split())
+                except ValueError as e:
+                    raise InvalidProgressionError('{} (line {})'.format(e, line_no))
+                overrides.update(self._check_overrides(options, line_no))
+            else:
+                lines.append(line)
+        if start is not None:
+            yield self._make_progression(entry_idx, start, lines, overrides)
+
+    def _read_json_lines(self, sf) -> Iterator[Progression]:
+        entry_idx = 0
+        for line_no, line in enumerate(sf, 1):
+            if line.strip() == '':
+                continue
+            try:
+                entry = json.loads(line)
+                init_cond, template = entry.pop('init'), entry.pop('formulas')
+            except (ValueError, KeyError, AttributeError) as e:
+                raise InvalidProgressionError(
+                    'Progression at line {} is not a valid entry: {}'.format(line_no, e)
+                )
+            yield Progression(entry_idx, line_no, init_cond,
+                              [str(formula).strip() for formula in template],
+                              self._check_overrides(entry, line_no))
+            entry_idx += 1
+
+    def __iter__(self) -> Iterator[Progression]:
+        if not self.source_filepath.endswith(self.EXTENSIONS):
+            raise ExtensionError(
+                'Source file specified has incorrect extension. Required: {}'.format(
+                    ' or '.join(self.EXTENSIONS)
+                )
+            )
+        path_to_file = os.path.abspath(self.source_filepath)
+        if not os.path.exists(path_to_file):
+            raise FileNotFoundError('Source file specified cannot be found')
+
+        with open(path_to_file, 'r') as sf:
+            if path_to_file.endswith('.jsonl'):
+                yield from self._read_json_lines(sf)
+            else:
+                yield from self._read_blocks(sf)
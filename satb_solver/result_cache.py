@@ -0,0 +1,82 @@
+from collections import OrderedDict
+from threading import Lock
+from typing import Callable, Dict, List, Optional
+
+from model.satb_elements import SATBSequence
+
+
+class ResultCache:
+    """
+    Solutions of recently solved progressions, by fingerprint of their parsed input
+    and the settings that decide their solutions. Past max_entries, the least recently
+    used solutions are evicted.
+
+    A progression that arrives while an identical one is being solved is not solved
+    again: it waits for the solutions (or the error) of the first. Cached solutions
+    are shared by every caller, not copied.
+    """
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max(1, max_entries)
+        self.entries = OrderedDict()
+        self.in_flight = {}
+        self.lock = Lock()
+        self.stats = {'hits': 0, 'coalesced': 0, 'misses': 0}
+
+    def lookup(self, fingerprint: str) -> Optional[List[SATBSequence]]:
+        with self.lock:
+            solutions = self.entries.get(fingerprint)
+            if solutions is None:
+                self.stats['misses'] += 1
+            else:
+                self.entries.move_to_end(fingerprint)
+                self.stats['hits'] += 1
+            return solutions
+
+    def store(self, fingerprint: str, solutions: List[SATBSequence]) -> None:
+        with self.lock:
+            self._store(fingerprint, solutions)
+
+    def _store(self, fingerprint: str, solutions: List[SATBSequence]) -> None:
+        self.entries[fingerprint] = solutions
+        self.entries.move_to_end(fingerprint)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+    def get_or_solve(self, fingerprint: str,
+                     solve: Callable[[], List[SATBSequence]]) -> List[SATBSequence]:
+        from concurrent.futures import Future
+
+        with self.lock:
+            solutions = self.entries.get(fingerprint)
+            if solutions is not None:
+                self.entries.move_to_end(fingerprint)
+                self.stats['hits'] += 1
+                return solutions
+            future = self.in_flight.get(fingerprint)
+            if future is None:
+                future = self.in_flight[fingerprint] = Future()
+                self.stats['misses'] += 1
+                owner = True
+            else:
+                self.stats['coalesced'] += 1
+                owner = False
+        if not owner:
+            return future.result()
+        try:
+            solutions = solve()
+        except BaseException as e:
+            # Errors are not cached, but every waiting caller gets this one
+            with self.lock:
+                del self.in_flight[fingerprint]
+            future.set_exception(e)
+            raise
+        with self.lock:
+            self._store(fingerprint, solutions)
+            del self.in_flight[fingerprint]
+        future.set_result(solutions)
+        return solutions
+
+    def get_stats(self) -> Dict[str, int]:
+        with self.lock:
+            return dict(self.stats, entries=len(self.entries))
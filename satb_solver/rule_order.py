@@ -0,0 +1,123 @@
+from threading import Lock, local
+from time import perf_counter_ns
+from typing import List
+
+from model.dt_def import Transition, TransitionContext
+from model.transition_rules import AbstractRule
+
+
+class _RuleCounts:
+    # Counts of the validations of one thread, which only that thread updates
+
+    def __init__(self, rules: List[AbstractRule]):
+        self.calls = {rule: 0 for rule in rules}
+        self.rejections = {rule: 0 for rule in rules}
+        self.timed_calls = {rule: 0 for rule in rules}
+        self.timed_ns = {rule: 0 for rule in rules}
+        self.validations = 0
+
+    def add(self, other: '_RuleCounts') -> None:
+        for field in ('calls', 'rejections', 'timed_calls', 'timed_ns'):
+            totals = getattr(self, field)
+            for rule, count in getattr(other, field).items():
+                totals[rule] += count
+        self.validations += other.validations
+
+
+class AdaptiveRuleOrder:
+    """
+    Applies transition rules in the order that minimizes the expected cost of
+    rejecting a configuration. Every rule counts how often it is reached and how often
+    it rejects; a sample of its calls is timed. Rules are periodically sorted by cost
+    per call over rejection rate, which is the optimal order for independent filters.
+    A configuration is valid only if every rule accepts it, so the order never
+    changes which configurations are valid.
+
+    Threads that solve at the same time count separately, and the counts of all of
+    them are summed when rules are sorted.
+    """
+    # Validations between reorderings
+    REORDER_INTERVAL = 2048
+    # One in this many validations is timed, as timing every rule call costs more than
+    #  most of the rules themselves
+    TIMING_INTERVAL = 16
+
+    def __init__(self, rules: List[AbstractRule]):
+        self.rules = list(rules)
+        self.order = list(rules)
+        self.reorders = 0
+        self.lock = Lock()
+        self.local = local()
+        self.thread_counts = []
+
+    def _get_counts(self) -> _RuleCounts:
+        counts = getattr(self.local, 'counts', None)
+        if counts is None:
+            counts = self.local.counts = _RuleCounts(self.rules)
+            with self.lock:
+                self.thread_counts.append(counts)
+        return counts
+
+    def get_totals(self) -> _RuleCounts:
+        totals = _RuleCounts(self.rules)
+        with self.lock:
+            for counts in self.thread_counts:
+                totals.add(counts)
+        return totals
+
+    @staticmethod
+    def _get_expected_cost(totals: _RuleCounts, rule: AbstractRule) -> float:
+        # Rules that never reject go last, in their current order
+        if totals.rejections[rule] == 0 or totals.timed_calls[rule] == 0:
+            return float('inf')
+        cost = totals.timed_ns[rule] / totals.timed_calls[rule]
+        return cost * totals.calls[rule] / totals.rejections[rule]
+
+    def _reorder(self) -> None:
+        totals = self.get_totals()
+        with self.lock:
+            self.order = sorted(self.order,
+                                key=lambda rule: self._get_expected_cost(totals, rule))
+            self.reorders += 1
+
+    def validate(self, matchings: List[Transition],
+                 transition_context: TransitionContext) -> bool:
+        counts = self._get_counts()
+        counts.validations += 1
+        if counts.validations % self.REORDER_INTERVAL == 0:
+            self._reorder()
+        calls, rejections = counts.calls, counts.rejections
+        if counts.validations % self.TIMING_INTERVAL != 0:
+            for rule in self.order:
+                calls[rule] += 1
+                if not rule.validate(matchings, transition_context):
+                    rejections[rule] += 1
+                    return False
+            return True
+        for rule in self.order:
+            calls[rule] += 1
+            t0 = perf_counter_ns()
+            valid = rule.validate(matchings, transition_context)
+            counts.timed_ns[rule] += perf_counter_ns() - t0
+            counts.timed_calls[rule] += 1
+            if not valid:
+                rejections[rule] += 1
+                return False
+        return True
+
+    def format_stats(self) -> str:
+        totals = self.get_totals()
+        lines = ['Rule order after {} validations ({} reorderings):'.format(
+            totals.validations, self.reorders
+        )]
+        lines.append('{:<42}{:>12}{:>12}{:>10}{:>12}'.format(
+            'Rule', 'Calls', 'Rejections', 'Reject %', 'ns/call'
+        ))
+        for rule in self.order:
+            calls, timed_calls = totals.calls[rule], totals.timed_calls[rule]
+            lines.append('{:<42}{:>12}{:>12}{:>10.1f}{:>12.0f}'.format(
+                rule.__name__, calls, totals.rejections[rule],
+                100 * totals.rejections[rule] / calls if calls else 0,
+                totals.timed_ns[rule] / timed_calls if timed_calls else 0
+            ))
+        return '\n'.join(lines)
@@ -1,46 +1,199 @@
-import os
-from typing import List
+from typing import Dict, Iterator, List, Optional, Tuple
 
-from model.exceptions import ExtensionError
+from model.chord_formulas import Chord
+from model.dt_def import Progression
+from model.exceptions import BaseException as SolverError
 from model.satb_elements import SATBSequence
-from model.solver_config import get_config
+from model.solver_config import config_overrides, get_config
 from satb_solver.chord_transitioner import ChordTransitioner
+from satb_solver.fingerprint import get_solve_fingerprint
+from satb_solver.progression_reader import ProgressionReader
+from satb_solver.result_cache import ResultCache
 from satb_solver.solution_interface import SolutionInterface
+from satb_solver.solution_writer import SolutionWriter
 from satb_solver.template_parser import TemplateParser
+from satb_solver.transposer import Transposer
 
 
 class SATBSolver:
+    # Errors that concern a single progression, which is then reported on its own
+    PROGRESSION_ERRORS = (SolverError, AssertionError, ValueError)
+
     def __init__(self, source_filepath):
         self.source_filepath = source_filepath
         self.template_parser = TemplateParser()
         self.chord_transitioner = ChordTransitioner()
+        cache_entries = get_config()['result_cache_entries']
+        self.result_cache = None if cache_entries is None else ResultCache(cache_entries)
+
+    def read_source(self) -> Iterator[Progression]:
+        # Each progression is an initial condition of voices followed by chord formulae,
+        #  read lazily so that large files are never held in memory
+        return iter(ProgressionReader(self.source_filepath))
+
+    def _get_fingerprint(self, init_notes: List[str], chord_sequence: List[Chord],
+                         pins: Dict[int, List[str]]) -> str:
+        # Formulas are keyed by their names as written, so differently written aliases of
+        #  one chord are cached apart. The order of notes makes no difference.
+        return get_solve_fingerprint(
+            sorted(init_notes),
+            [chord.formula_name + (' = ' + ' '.join(sorted(pins[step])) if step in pins else '')
+             for step, chord in enumerate(chord_sequence)],
+            get_config()
+        )
+
+    def solve_progression(self, progression: Progression) -> List[SATBSequence]:
+        with config_overrides(**progression.overrides):
+            # Perform small bit of validation of initial condition
+            init_notes = list(self.template_parser.parse_init_cond(progression.init_cond))
+            # Parse formula template into chord formula models
+            formulas, pins = self.template_parser.split_pins(progression.template)
+            chord_sequence = list(self.template_parser.parse_template(formulas))
+
+            if get_config()['user_intermed']:
+                return self.chord_transitioner.user_transition_chords(chord_sequence, init_notes,
+                                                                      pins)
+            if self.result_cache is None:
+                return self.chord_transitioner.transition_chords(chord_sequence, init_notes,
+                                                                 pins)
+            # Identical progressions, even solved at the same time, are solved once
+            return self.result_cache.get_or_solve(
+                self._get_fingerprint(init_notes, chord_sequence, pins),
+                lambda: self.chord_transitioner.transition_chords(chord_sequence, init_notes,
+                                                                  pins)
+            )
+
+    def solve_batch(self, progressions: List[Progression]) -> List[List[SATBSequence]]:
+        # Progressions are solved together per set of overridden settings, so that
+        #  common openings are shared. Pinned progressions are solved on their own.
+        solutions = [None] * len(progressions)
+        groups = {}
+        for idx, progression in enumerate(progressions):
+            if any(TemplateParser.PIN_SEPARATOR in line for line in progression.template):
+                solutions[idx] = self.solve_progression(progression)
+                continue
+            groups.setdefault(tuple(sorted(progression.overrides.items())), []).append(idx)
+        for overrides, idxs in groups.items():
+            with config_overrides(**dict(overrides)):
+                batch = {idx: (
+                    list(self.template_parser.parse_template(progressions[idx].template)),
+                    list(self.template_parser.parse_init_cond(progressions[idx].init_cond))
+                ) for idx in idxs}
+                fingerprints = {}
+                if self.result_cache is not None:
+                    # Progressions solved before are not solved again
+                    for idx, (chord_seq, init_notes) in batch.items():
+                        fingerprints[idx] = self._get_fingerprint(init_notes, chord_seq, {})
+                        solutions[idx] = self.result_cache.lookup(fingerprints[idx])
+                unsolved = [idx for idx in idxs if solutions[idx] is None]
+                batch_solutions = self.chord_transitioner.transition_chords_batch(
+                    [batch[idx] for idx in unsolved]
+                )
+                for idx, solution_seqs in zip(unsolved, batch_solutions):
+                    solutions[idx] = solution_seqs
+                    if self.result_cache is not None:
+                        self.result_cache.store(fingerprints[idx], solution_seqs)
+        return solutions
+
+    def _try_solve(self, progression: Progression) -> Tuple[Optional[List[SATBSequence]],
+                                                             Optional[Exception]]:
+        try:
+            return self.solve_progression(progression), None
+        except self.PROGRESSION_ERRORS as e:
+            return None, e
+
+    def _try_solve_batch(
+        self, progressions: List[Progression]
+    ) -> Iterator[Tuple[Progression, Optional[List[SATBSequence]], Optional[Exception]]]:
+        try:
+            for progression, solutions in zip(progressions, self.solve_batch(progressions)):
+                yield progression, solutions, None
+        except self.PROGRESSION_ERRORS:
+            # One progression failed the whole batch, so each is solved on its own
+            for progression in progressions:
+                yield (progression, *self._try_solve(progression))
+
+    def solve_all_keys(
+        self, progression: Progression
+    ) -> Iterator[Tuple[Progression, Optional[List[SATBSequence]], Optional[Exception]]]:
+        # Solved once, then moved into every key; keys where a moved voicing leaves
+        #  its voice range are solved on their own
+        solutions, error = self._try_solve(progression)
+        if error is not None:
+            yield progression, None, error
+            return
+        transposer = Transposer(self.template_parser)
+        with config_overrides(**progression.overrides):
+            formulas, pins = self.template_parser.split_pins(progression.template)
+            for key in Transposer.KEYS:
+                template, shift = transposer.transpose_template(formulas, key)
+                # Every solution passes through the pinned voicings, so they move with it
+                pinned_template = [
+                    formula + ' {} {}'.format(TemplateParser.PIN_SEPARATOR,
+                                              transposer.transpose_init_cond(
+                                                  solutions[0].sequence[step], [formula], shift
+                                              ))
+                    if step in pins else formula
+                    for step, formula in enumerate(template)
+                ]
+                key_progression = Progression(
+                    progression.entry_idx, progression.line_no,
+                    transposer.transpose_init_cond(solutions[0].sequence[0], template, shift),
+                    pinned_template, progression.overrides
+                )
+                key_solutions = transposer.transpose_solutions(solutions, template, shift)
+                if key_solutions is None:
+                    yield (key_progression, *self._try_solve(key_progression))
+                else:
+                    yield key_progression, key_solutions, None
+
+    def iter_solutions(
+        self, batch_size: int = 1, all_keys: bool = False
+    ) -> Iterator[Tuple[Progression, Optional[List[SATBSequence]], Optional[Exception]]]:
+        """
+        Solutions of every progression of the source, or the error that kept a
+        progression from being solved. Failed progressions do not stop the others.
+        """
+        if all_keys:
+            for progression in self.read_source():
+                yield from self.solve_all_keys(progression)
+            return
+        # Interactive solving always goes one progression at a time
+        if batch_size <= 1 or get_config()['user_intermed']:
+            for progression in self.read_source():
+                yield (progression, *self._try_solve(progression))
+            return
+        chunk = []
+        for progression in self.read_source():
+            chunk.append(progression)
+            if len(chunk) == batch_size:
+                yield from self._try_solve_batch(chunk)
+                chunk = []
+        if len(chunk) > 0:
+            yield from self._try_solve_batch(chunk)
 
-    def read_source(self):
-        if not self.source_filepath.endswith('.txt'):
-            raise ExtensionError('Source file specified has incorrect extension. Required: .txt')
-        path_to_file = os.path.abspath(self.source_filepath)
-        if not os.path.exists(path_to_file):
-            raise FileNotFoundError('Source file specified cannot be found')
-
-        # First line of input is initial condition of voices.
-        # Further lines are chord formulae.
-        with open(path_to_file, 'r') as sf:
-            sf_it = iter(sf)
-            yield next(sf)
-            for value in sf_it:
-                yield value.strip()
-
-    def solve(self):
-        # Split input data into initial condition and chord formula template
-        init_cond, *template = self.read_source()
-        # Perform small bit of validation of initial condition
-        init_notes = self.template_parser.parse_init_cond(init_cond)
-        # Parse formula template into chord formula models
-        chord_sequence = self.template_parser.parse_template(template.copy())
-
-        if get_config()['user_intermed']:
-            solutions = self.chord_transitioner.user_transition_chords(chord_sequence, init_notes)
-        else:
-            solutions = self.chord_transitioner.transition_chords(chord_sequence, init_notes)
-
-        SolutionInterface().report_final_solutions(template.copy(), solutions)
+    def solve(self, writer: SolutionWriter = None, batch_size: int = 1,
+              all_keys: bool = False) -> int:
+        """
+        Solves every progression of the source and returns the number that failed.
+        """
+        failures = 0
+        for i, (progression, solutions, error) in enumerate(
+            self.iter_solutions(batch_size, all_keys)
+        ):
+            failures += error is not None
+            if writer is not None:
+                if error is not None:
+                    writer.write_error(progression, error)
+                else:
+                    writer.write(progression, solutions)
+                continue
+            if i > 0:
+                print()
+            if error is not None:
+                SolutionInterface().report_failed_progression(progression, error)
+                continue
+            with config_overrides(**progression.overrides):
+                formulas, _ = self.template_parser.split_pins(progression.template)
+            SolutionInterface().report_final_solutions(formulas, solutions)
+        return failures
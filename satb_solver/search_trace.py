@@ -0,0 +1,187 @@
+import atexit
+import json
+from contextlib import contextmanager
+from functools import lru_cache
+from threading import Lock, local
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from model.dt_def import FrontierEntry
+from model.satb_elements import SATBChord
+from model.solver_config import get_config
+
+
+def _get_note_names(satb_chord: SATBChord) -> List[str]:
+    return [note.note_name + str(note.octave) for note in satb_chord._key()]
+
+
+class SearchTrace:
+    """
+    Search events of every solve, appended to a JSON Lines file, one event per line:
+      transition  a transition search starts: cur_formula, cur (notes), next_formula
+      pop         a bucket of equally costly candidate transitions was taken from the
+                  heap: diff, trans (transitions in it), configs (configurations after it)
+      check       configurations were validated: configs, valid, rejects (by rule)
+      result      the transition search ended: cost, count (optimal transitions), ns
+      aggregate   a frontier was aggregated: candidates (arrived configurations),
+                  over_lead (dropped for trailing too far), configs (kept)
+      solve       a solve ended: formulas, ns; followed by a frontier line per step
+      frontier    entries of a step: [cost, notes, back-pointer indices into the
+                  previous frontier]
+    pop and check lines come from the breadth-first engine. The events of one
+    transition search are written together, even while other threads search.
+    """
+
+    def __init__(self, path: str):
+        self.file = open(path, 'a')
+        self.lock = Lock()
+        self.local = local()
+        atexit.register(self.close)
+
+    def _write(self, lines: List[str]) -> None:
+        with self.lock:
+            if not self.file.closed:
+                self.file.write(''.join(lines))
+
+    def record(self, event: str, **fields) -> None:
+        line = json.dumps(dict(ev=event, **fields), separators=(',', ':')) + '\n'
+        pending = getattr(self.local, 'pending', None)
+        if pending is None:
+            self._write([line])
+        else:
+            pending.append(line)
+
+    @contextmanager
+    def grouped(self) -> Iterator[None]:
+        self.local.pending = []
+        try:
+            yield
+        finally:
+            lines, self.local.pending = self.local.pending, None
+            self._write(lines)
+
+    def record_solve(self, step_names: List[str], layers: List[Dict[Tuple, FrontierEntry]],
+                     elapsed_ns: int) -> None:
+        lines = [json.dumps(dict(ev='solve', formulas=step_names, ns=elapsed_ns),
+                            separators=(',', ':')) + '\n']
+        prev_layer = None
+        for layer in layers:
+            prev_idxs = {key: idx for idx, key in enumerate(prev_layer or {})}
+            lines.append(json.dumps(dict(ev='frontier', entries=[
+                [entry.cost, _get_note_names(entry.chord),
+                 [prev_idxs[key] for key in entry.back_ptrs]]
+                for entry in layer.values()
+            ]), separators=(',', ':')) + '\n')
+            prev_layer = layer
+        self._write(lines)
+        self.flush()
+
+    def flush(self) -> None:
+        with self.lock:
+            if not self.file.closed:
+                self.file.flush()
+
+    def close(self) -> None:
+        with self.lock:
+            self.file.close()
+
+
+@lru_cache(maxsize=4)
+def _open_search_trace(path: str) -> SearchTrace:
+    return SearchTrace(path)
+
+
+def get_search_trace() -> Optional[SearchTrace]:
+    path = get_config()['trace_path']
+    if path is None:
+        return None
+    return _open_search_trace(path)
+
+
+class TraceReplay:
+    """
+    Summary of a recorded trace, and the optimal sequences of each solve in it,
+    regenerated from its frontiers without solving again.
+    """
+
+    def __init__(self, path: str):
+        self.transitions = []
+        self.rejects = {}
+        self.aggregates = {'candidates': 0, 'over_lead': 0, 'configs': 0, 'count': 0}
+        self.solves = []
+        with open(path, 'r') as tf:
+            self._read(json.loads(line) for line in tf if line.endswith('\n'))
+
+    def _read(self, events: Iterator[Dict]) -> None:
+        transition = None
+        for event in events:
+            kind = event['ev']
+            if kind == 'transition':
+                transition = dict(event, pops=0, configs=0, checked=0)
+                self.transitions.append(transition)
+            elif kind == 'pop':
+                transition['pops'] += 1
+                transition['configs'] = max(transition['configs'], event['configs'])
+            elif kind == 'check':
+                transition['checked'] += event['configs']
+                for rule, count in event.get('rejects', {}).items():
+                    self.rejects[rule] = self.rejects.get(rule, 0) + count
+            elif kind == 'result':
+                transition.update(cost=event['cost'], count=event['count'], ns=event['ns'])
+            elif kind == 'aggregate':
+                for field in ('candidates', 'over_lead', 'configs'):
+                    self.aggregates[field] += event[field]
+                self.aggregates['count'] += 1
+            elif kind == 'solve':
+                self.solves.append(dict(event, frontiers=[]))
+            elif kind == 'frontier':
+                self.solves[-1]['frontiers'].append(event['entries'])
+
+    def get_hotspots(self, count: int) -> List[Dict]:
+        # Transition searches that took longest
+        return sorted((transition for transition in self.transitions if 'ns' in transition),
+                      key=lambda transition: transition['ns'], reverse=True)[:count]
+
+    @staticmethod
+    def get_optimal_sequences(frontiers: List[List], max_count: int) -> List[Tuple[List, int]]:
+        # Back-pointers from the cheapest entries of the last frontier, as in the solver
+        min_cost = min(cost for cost, _, _ in frontiers[-1])
+        paths = [[idx] for idx, (cost, _, _) in enumerate(frontiers[-1]) if cost == min_cost]
+        for step in range(len(frontiers) - 1, 0, -1):
+            paths = [[prev_idx] + path for path in paths
+                     for prev_idx in frontiers[step][path[0]][2]][:max_count]
+        return [([frontiers[step][idx][1] for step, idx in enumerate(path)], min_cost)
+                for path in paths]
+
+    def format_summary(self, count: int) -> str:
+        lines = ['{} transition searches, {} solves'.format(len(self.transitions),
+                                                          len(self.solves))]
+        lines.append('Slowest transition searches:')
+        lines.append('{:>10}{:>8}{:>10}{:>10}  {}'.format(
+            'ms', 'pops', 'configs', 'checked', 'Transition'
+        ))
+        for transition in self.get_hotspots(count):
+            lines.append('{:>10.2f}{:>8}{:>10}{:>10}  {} {} -> {}'.format(
+                transition['ns'] / 1e6, transition['pops'], transition['configs'],
+                transition['checked'], transition['cur_formula'],
+                ' '.join(transition['cur']), transition['next_formula']
+            ))
+        lines.append('Rule rejections:')
+        for rule, rejections in sorted(self.rejects.items(), key=lambda item: -item[1]):
+            lines.append('{:<42}{:>12}'.format(rule, rejections))
+        lines.append('Frontier aggregation: {count} frontiers, {candidates} arrived '
+                     'configurations, {over_lead} over the cost lead, {configs} kept'.format(
+                         **self.aggregates))
+        return '\n'.join(lines)
+
+    def format_solves(self, count: int) -> str:
+        lines = []
+        for solve in self.solves:
+            lines.append('{} ({:.2f} ms, frontier sizes {})'.format(
+                ' '.join(solve['formulas']), solve['ns'] / 1e6,
+                [len(entries) for entries in solve['frontiers']]
+            ))
+            for chords, cost in self.get_optimal_sequences(solve['frontiers'], count):
+                lines.append('  cost {}: {}'.format(
+                    cost, ' | '.join(' '.join(notes) for notes in chords)
+                ))
+        return '\n'.join(lines)
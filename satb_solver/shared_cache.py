@@ -0,0 +1,141 @@
+import mmap
+import os
+import struct
+import zlib
+from functools import lru_cache
+from threading import Lock
+from typing import List, Optional, Set, Tuple
+
+from model.chord_formulas import Chord
+from model.dt_def import NotePosPair
+from model.satb_elements import SATBChord
+from model.solver_config import get_config
+from satb_solver.fingerprint import get_config_fingerprint
+from satb_solver.transition_table import TransitionTable
+
+
+class SharedTransitionCache:
+    """
+    Optimal transitions found by any process on the host, kept in one memory-mapped
+    file that every process appends to. Layout:
+      header   MAGIC
+      records  key hash (u64), payload length (u16), checksum (u32), then the payload
+               of a TransitionTable entry
+    Each record is appended with a single write to the file opened for appending, so
+    records of different processes never interleave and no lock is taken. A record
+    that is still being written fails its checksum, and is read once it is complete.
+    Keys hash the settings along with the transition, so one file serves any settings.
+
+    Processes only index where records start; the transitions themselves are read
+    from the page cache that all of them share. Within a process, the mapping is only
+    read or replaced under a lock, as a refresh remaps it once the file has grown.
+    """
+    MAGIC = b'SATBSC01'
+    RECORD_HEAD = struct.Struct('<QHI')
+
+    def __init__(self, path: str):
+        self._create(path)
+        self.fd = os.open(path, os.O_RDWR | os.O_APPEND)
+        self.buffer = mmap.mmap(self.fd, 0, access=mmap.ACCESS_READ)
+        if self.buffer[:len(self.MAGIC)] != self.MAGIC:
+            raise ValueError('{} is not a shared transition cache.'.format(path))
+        self.index = {}
+        self.read_offset = len(self.MAGIC)
+        self.lock = Lock()
+        self.checked_config, self.config_fingerprint = None, None
+
+    @classmethod
+    def _create(cls, path: str) -> None:
+        # Linked into place in one step, so that a file seen by other processes always
+        #  starts with its header
+        if os.path.exists(path):
+            return
+        tmp_path = '{}.{}.tmp'.format(path, os.getpid())
+        with open(tmp_path, 'wb') as cf:
+            cf.write(cls.MAGIC)
+        try:
+            os.link(tmp_path, path)
+        except FileExistsError:
+            pass
+        finally:
+            os.remove(tmp_path)
+
+    def _get_config_fingerprint(self) -> bytes:
+        config = get_config()
+        if config is not self.checked_config:
+            self.checked_config = config
+            self.config_fingerprint = get_config_fingerprint(config)
+        return self.config_fingerprint
+
+    def _get_key_hash(self, cur_satb_chord: SATBChord,
+                      next_chord_formula: Chord) -> Optional[int]:
+        from hashlib import blake2b
+
+        if not (TransitionTable.is_keyable(cur_satb_chord.chord_formula) and
+                TransitionTable.is_keyable(next_chord_formula)):
+            return None
+        key = self._get_config_fingerprint() + TransitionTable.get_key_hash(
+            cur_satb_chord.chord_formula.formula_name,
+            sorted(pair.note_repr.abs_pos for pair in cur_satb_chord.key_pos_pairs),
+            next_chord_formula.formula_name
+        ).to_bytes(8, 'little')
+        return int.from_bytes(blake2b(key, digest_size=8).digest(), 'little')
+
+    def _refresh(self) -> None:
+        # Indexes the records appended since the last refresh, by any process. Called
+        #  with the lock held.
+        size = os.fstat(self.fd).st_size
+        if size > len(self.buffer):
+            self.buffer.close()
+            self.buffer = mmap.mmap(self.fd, 0, access=mmap.ACCESS_READ)
+        offset = self.read_offset
+        while offset + self.RECORD_HEAD.size <= size:
+            key_hash, length, checksum = self.RECORD_HEAD.unpack_from(self.buffer, offset)
+            payload = offset + self.RECORD_HEAD.size
+            if (
+                payload + length > size or
+                zlib.crc32(self.buffer[offset:offset + 8] +
+                           self.buffer[payload:payload + length]) != checksum
+            ):
+                break
+            self.index.setdefault(key_hash, payload)
+            offset = payload + length
+        self.read_offset = offset
+
+    def lookup(self, cur_satb_chord: SATBChord,
+               next_chord_formula: Chord) -> Optional[Tuple[List[Set[NotePosPair]], int]]:
+        key_hash = self._get_key_hash(cur_satb_chord, next_chord_formula)
+        if key_hash is None:
+            return None
+        with self.lock:
+            if key_hash not in self.index:
+                self._refresh()
+                if key_hash not in self.index:
+                    return None
+            return TransitionTable.decode_payload(self.buffer, self.index[key_hash],
+                                                  get_config()['voice_count'],
+                                                  next_chord_formula)
+
+    def store(self, cur_satb_chord: SATBChord, next_chord_formula: Chord,
+              results: List[Set[NotePosPair]], cost: int) -> None:
+        key_hash = self._get_key_hash(cur_satb_chord, next_chord_formula)
+        if key_hash is None:
+            return
+        payload = TransitionTable.encode_payload(results, cost)
+        if payload is None:
+            return
+        key = key_hash.to_bytes(8, 'little')
+        os.write(self.fd, self.RECORD_HEAD.pack(key_hash, len(payload),
+                                                zlib.crc32(key + payload)) + payload)
+
+
+@lru_cache(maxsize=4)
+def _open_shared_cache(path: str) -> SharedTransitionCache:
+    return SharedTransitionCache(os.path.abspath(path))
+
+
+def get_shared_cache() -> Optional[SharedTransitionCache]:
+    path = get_config()['shared_cache_path']
+    if path is None:
+        return None
+    return _open_shared_cache(path)
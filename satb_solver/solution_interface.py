@@ -1,12 +1,16 @@
 import os
 from typing import List
 
-from termcolor import colored
-
-from model.dt_def import ChordNode
+from model.dt_def import ChordNode, Progression
 from model.satb_elements import SATBChord, SATBSequence
 
 
+def colored(text: str, color: str) -> str:
+    # termcolor is only imported once something is printed
+    from termcolor import colored as termcolor_colored
+    return termcolor_colored(text, color)
+
+
 class SolutionInterface:
 
     def __init__(self, templ_padding: int = 4, seq_padding: int = 8):
@@ -77,6 +81,11 @@ class SolutionInterface:
             else:
                 print(colored('Invalid choice. Try again.', 'red'))
 
+    def report_failed_progression(self, progression: Progression, error: Exception):
+        print(colored('Progression at line {} could not be solved: {}'.format(
+            progression.line_no, error
+        ), 'red'))
+
     def report_final_solutions(self, template: List[str], solution_seqs: List[SATBSequence]):
         # Print entire chord formula template
         print((' ' * self.templ_padding).join(template))
@@ -89,6 +98,9 @@ class SolutionInterface:
         sol_num = len(solution_seqs)
         print(colored('{} Optimal Solution{}:'.format(sol_num, '' if sol_num == 1 else 's'),
                       'green'))
+        if any(satb_seq.bounded for satb_seq in solution_seqs):
+            print(colored('Frontier reached max_frontier_entries: solutions may be '
+                          'sub-optimal or incomplete', 'yellow'))
         print()
         for satb_seq in solution_seqs:
             print('-' * width)
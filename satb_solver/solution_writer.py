@@ -0,0 +1,129 @@
+import csv
+import io
+import json
+import sys
+from typing import List
+
+from model.dt_def import Progression
+from model.satb_elements import SATBChord, SATBSequence
+
+
+class SolutionWriter:
+    """
+    Writes solutions as JSON Lines (one progression per line) or CSV (one row per chord
+    of each solution) for further processing. Records are buffered and written in bulk:
+    in streaming mode after every progression, otherwise every buffer_size progressions.
+    """
+    FORMATS = ('jsonl', 'csv')
+    CSV_HEADER = ['entry', 'solution', 'solution_count', 'cost', 'step', 'formula',
+                  'midi', 'notes', 'bounded', 'error']
+    # MIDI note number of absolute position 0 (C0)
+    MIDI_OFFSET = 12
+
+    def __init__(self, output_path: str, fmt: str = None, streaming: bool = False,
+                 buffer_size: int = 1000):
+        self.fmt = fmt or self.infer_format(output_path)
+        if self.fmt not in self.FORMATS:
+            raise ValueError('Output format must be one of: {}'.format(', '.join(self.FORMATS)))
+        self.output_path = output_path
+        self.buffer_size = 1 if streaming else buffer_size
+        self.buffer = io.StringIO()
+        self.pending = 0
+        self.csv_writer = csv.writer(self.buffer, lineterminator='\n')
+        if output_path == '-':
+            self.out_file = sys.stdout
+        else:
+            self.out_file = open(output_path, 'w', newline='')
+        if self.fmt == 'csv':
+            self.csv_writer.writerow(self.CSV_HEADER)
+
+    @classmethod
+    def infer_format(cls, output_path: str) -> str:
+        return 'csv' if output_path.endswith('.csv') else 'jsonl'
+
+    def _get_voicing(self, chord: SATBChord):
+        # Lowest voice first
+        notes = sorted((pair.note_repr for pair in chord.key_pos_pairs),
+                       key=lambda note: note.abs_pos)
+        return ([note.abs_pos + self.MIDI_OFFSET for note in notes],
+                [note.note_name + str(note.octave) for note in notes])
+
+    def _write_json_line(self, progression: Progression,
+                         solution_seqs: List[SATBSequence]) -> None:
+        solutions = []
+        for satb_seq in solution_seqs:
+            steps = []
+            for step, chord in enumerate(satb_seq.sequence):
+                midi, notes = self._get_voicing(chord)
+                steps.append({'step': step, 'formula': chord.chord_formula.formula_name,
+                              'midi': midi, 'notes': notes})
+            solutions.append({'cost': satb_seq.seq_cost, 'steps': steps})
+        self.buffer.write(json.dumps({
+            'entry': progression.entry_idx,
+            'template': progression.template,
+            'solution_count': len(solution_seqs),
+            'bounded': any(satb_seq.bounded for satb_seq in solution_seqs),
+            'solutions': solutions
+        }, separators=(',', ':')))
+        self.buffer.write('\n')
+
+    def _write_csv_rows(self, progression: Progression,
+                        solution_seqs: List[SATBSequence]) -> None:
+        for sol_idx, satb_seq in enumerate(solution_seqs):
+            for step, chord in enumerate(satb_seq.sequence):
+                midi, notes = self._get_voicing(chord)
+                self.csv_writer.writerow([
+                    progression.entry_idx, sol_idx, len(solution_seqs), satb_seq.seq_cost,
+                    step, chord.chord_formula.formula_name,
+                    ' '.join(map(str, midi)), ' '.join(notes), int(satb_seq.bounded), ''
+                ])
+
+    def _format_error(self, error: Exception) -> str:
+        return '{}: {}'.format(type(error).__name__, error)
+
+    def _end_record(self) -> None:
+        self.pending += 1
+        if self.pending >= self.buffer_size:
+            self.flush()
+
+    def write(self, progression: Progression, solution_seqs: List[SATBSequence]) -> None:
+        if self.fmt == 'jsonl':
+            self._write_json_line(progression, solution_seqs)
+        else:
+            self._write_csv_rows(progression, solution_seqs)
+        self._end_record()
+
+    def write_error(self, progression: Progression, error: Exception) -> None:
+        """
+        Records a progression that could not be solved in place of its solutions.
+        """
+        if self.fmt == 'jsonl':
+            self.buffer.write(json.dumps({
+                'entry': progression.entry_idx,
+                'template': progression.template,
+                'solution_count': 0,
+                'error': self._format_error(error)
+            }, separators=(',', ':')))
+            self.buffer.write('\n')
+        else:
+            self.csv_writer.writerow([progression.entry_idx, '', 0, '', '', '', '', '', '',
+                                      self._format_error(error)])
+        self._end_record()
+
+    def flush(self) -> None:
+        self.out_file.write(self.buffer.getvalue())
+        self.out_file.flush()
+        self.buffer.seek(0)
+        self.buffer.truncate()
+        self.pending = 0
+
+    def close(self) -> None:
+        self.flush()
+        if self.out_file is not sys.stdout:
+            self.out_file.close()
+
+    def __enter__(self) -> 'SolutionWriter':
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
@@ -1,8 +1,7 @@
 import re
 from collections import namedtuple
-from typing import Iterator, List
-
-from cached_property import cached_property
+from functools import cached_property
+from typing import Dict, Iterator, List, Tuple
 
 from model.chord_formulas import (AUGChord, Chord, DIM7Chord, DIMChord,
                                   DOM7Chord, DOM9Chord, DOM11Chord, DOM13Chord,
@@ -16,6 +15,11 @@ from model.solver_config import get_config
 
 
 class TemplateParser:
+    # Resolved chords by (formula, voice count), shared by every parser instance
+    _composition_cache = {}
+    # Separates a formula from the voicing it is pinned to, as in "Cmaj = C3 G3 E4 C5"
+    PIN_SEPARATOR = '='
+
     def __init__(self):
         pass
 
@@ -77,10 +81,21 @@ class TemplateParser:
         full_chord.annotate(chord_formula)
         return full_chord
 
+    def get_composition(self, chord_formula: str) -> Chord:
+        """
+        Resolved, read-only chord of a formula. Repeated formulas share one chord.
+        """
+        chord_formula = chord_formula.strip()
+        key = (chord_formula, get_config()['voice_count'])
+        chord = self._composition_cache.get(key)
+        if chord is None:
+            chord = self._composition_cache[key] = self._get_composition(chord_formula).freeze()
+        return chord
+
     def parse_template(self, template: List[str]) -> Iterator[Chord]:
         for formula in template:
             try:
-                yield self._get_composition(formula)
+                yield self.get_composition(formula)
             except UnknownChordError as e:
                 e.message = e.message.format(formula)
                 raise
@@ -92,3 +107,22 @@ class TemplateParser:
         )
         for note_str in notes:
             yield note_str
+
+    def split_pins(self, template: List[str]) -> Tuple[List[str], Dict[int, List[str]]]:
+        """
+        Formulas of a template, and the voicings some of its chords are pinned to by
+        chord index.
+        """
+        formulas, pins = [], {}
+        for step, line in enumerate(template):
+            formula, sep, notes = line.partition(self.PIN_SEPARATOR)
+            formulas.append(formula.strip())
+            if not sep:
+                continue
+            assert step > 0, 'The first chord is voiced by the initial condition'
+            pins[step] = notes.split()
+            assert len(pins[step]) == get_config()['voice_count'], (
+                'Pinned voicing of {} is not {}-part'.format(formula.strip(),
+                                                             get_config()['voice_count'])
+            )
+        return formulas, pins
@@ -0,0 +1,226 @@
+import mmap
+import os
+import struct
+from functools import lru_cache
+from typing import Iterable, List, Optional, Set, Tuple
+
+from model.chord_formulas import Chord
+from model.dt_def import NotePosPair
+from model.satb_elements import Note, SATBChord
+from model.solver_config import get_config
+from model.transition_rules import VoicesWithinRangeRule
+from satb_solver.fingerprint import get_config_fingerprint
+
+
+class TransitionTable:
+    """
+    Read-only table of precomputed optimal transitions, looked up straight from a
+    memory-mapped file. Layout:
+      header   MAGIC, voice count (u8), config fingerprint (32 bytes), entry count (u32)
+      index    entry count x (key hash (u64), payload offset (u32)), sorted by key hash
+      payload  per entry: cost (u16), result count (u8), result count x voice count
+               absolute positions (u8), lowest voice first
+    Keys hash the current chord formula, the current voicing and the next chord formula.
+    Transitions with more results or a higher cost than the payload holds are left out,
+    and searched live.
+    """
+    MAGIC = b'SATBTT02'
+    HEADER = struct.Struct('<8sB32sI')
+    INDEX_ENTRY = struct.Struct('<QI')
+    PAYLOAD_HEAD = struct.Struct('<HB')
+    MAX_COST = 0xFFFF
+    MAX_RESULTS = 0xFF
+
+    def __init__(self, path: str):
+        with open(path, 'rb') as tf:
+            self.buffer = mmap.mmap(tf.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self.voice_count, self.config_fingerprint, self.entry_count = (
+            self.HEADER.unpack_from(self.buffer, 0)
+        )
+        if magic[:6] == self.MAGIC[:6] and magic != self.MAGIC:
+            raise ValueError('{} was built by an older version of the solver; build it '
+                             'again.'.format(path))
+        if magic != self.MAGIC:
+            raise ValueError('{} is not a transition table.'.format(path))
+        self.index_start = self.HEADER.size
+        self.payload_start = self.index_start + self.entry_count * self.INDEX_ENTRY.size
+        self.checked_config, self.checked_applies = None, False
+
+    @classmethod
+    def get_key_hash(cls, cur_formula_name: str, cur_positions: Iterable[int],
+                     next_formula_name: str) -> int:
+        from hashlib import blake2b
+
+        key = '{}|{}|{}'.format(cur_formula_name, ','.join(map(str, cur_positions)),
+                                next_formula_name)
+        return int.from_bytes(blake2b(key.encode(), digest_size=8).digest(), 'little')
+
+    @staticmethod
+    def is_keyable(chord_formula: Chord) -> bool:
+        # Positions alone cannot tell enharmonically equal chord notes apart
+        semis = {pair.note_repr.semi_pos for pair in chord_formula.get_key_pos_pairs()}
+        return len(semis) == chord_formula.note_count()
+
+    def applies(self) -> bool:
+        # Settings are replaced, never changed in place, so the answer is kept for as
+        #  long as the same settings are active
+        config = get_config()
+        if config is not self.checked_config:
+            self.checked_config = config
+            self.checked_applies = (
+                self.voice_count == config['voice_count'] and
+                self.config_fingerprint == get_config_fingerprint(config)
+            )
+        return self.checked_applies
+
+    def _find_payload(self, key_hash: int) -> Optional[int]:
+        low, high = 0, self.entry_count
+        while low < high:
+            mid = (low + high) // 2
+            mid_hash, offset = self.INDEX_ENTRY.unpack_from(
+                self.buffer, self.index_start + mid * self.INDEX_ENTRY.size
+            )
+            if mid_hash < key_hash:
+                low = mid + 1
+            elif mid_hash > key_hash:
+                high = mid
+            else:
+                return self.payload_start + offset
+        return None
+
+    def lookup(self, cur_satb_chord: SATBChord,
+               next_chord_formula: Chord) -> Optional[Tuple[List[Set[NotePosPair]], int]]:
+        cur_positions = sorted(pair.note_repr.abs_pos for pair in cur_satb_chord.key_pos_pairs)
+        payload = self._find_payload(self.get_key_hash(
+            cur_satb_chord.chord_formula.formula_name, cur_positions,
+            next_chord_formula.formula_name
+        ))
+        if payload is None:
+            return None
+        return self.decode_payload(self.buffer, payload, self.voice_count, next_chord_formula)
+
+    @classmethod
+    def decode_payload(cls, buffer, payload: int, voice_count: int,
+                       next_chord_formula: Chord) -> Tuple[List[Set[NotePosPair]], int]:
+        cost, result_count = cls.PAYLOAD_HEAD.unpack_from(buffer, payload)
+        positions = buffer[payload + cls.PAYLOAD_HEAD.size:
+                           payload + cls.PAYLOAD_HEAD.size + result_count * voice_count]
+        pairs_by_semi = {pair.note_repr.semi_pos: pair
+                         for pair in next_chord_formula.get_key_pos_pairs()}
+        res = []
+        for i in range(0, len(positions), voice_count):
+            res.append({
+                NotePosPair(pairs_by_semi[pos % 12].scale_pos,
+                            Note(pairs_by_semi[pos % 12].note_repr, pos // 12))
+                for pos in positions[i:i + voice_count]
+            })
+        return res, cost
+
+    @classmethod
+    def encode_payload(cls, results: List[Set[NotePosPair]], cost: int) -> Optional[bytes]:
+        if len(results) > cls.MAX_RESULTS or cost > cls.MAX_COST:
+            return None
+        positions = []
+        for result in results:
+            positions.extend(sorted(pair.note_repr.abs_pos for pair in result))
+        return cls.PAYLOAD_HEAD.pack(cost, len(results)) + bytes(positions)
+
+    @classmethod
+    def write(cls, path: str, entries: Iterable[Tuple[int, bytes]]) -> None:
+        index, payloads, offset = [], [], 0
+        for key_hash, payload in entries:
+            index.append((key_hash, offset))
+            payloads.append(payload)
+            offset += len(payload)
+        index.sort()
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'wb') as tf:
+            tf.write(cls.HEADER.pack(cls.MAGIC, get_config()['voice_count'],
+                                     get_config_fingerprint(get_config()), len(index)))
+            for entry in index:
+                tf.write(cls.INDEX_ENTRY.pack(*entry))
+            for payload in payloads:
+                tf.write(payload)
+        os.replace(tmp_path, path)
+        _open_transition_table.cache_clear()
+
+
+def get_common_vocabulary(roots: Iterable[str]) -> List[str]:
+    # Triads and seventh chords known to TemplateParser, in every inversion
+    qualities = {'maj': ['', '_6', '_64'], 'min': ['', '_6', '_64'],
+                 'dim': ['', '_6', '_64'], 'aug': ['', '_6', '_64'],
+                 'maj7': ['', '_65', '_43', '_42'], 'min7': ['', '_65', '_43', '_42'],
+                 'dim7': ['', '_65', '_43', '_42'], '7': ['', '_65', '_43', '_42']}
+    return [root + quality + inv
+            for root in roots for quality, invs in qualities.items() for inv in invs]
+
+
+def _build_entries(cur_formula: str, next_formulas: List[str]) -> List[Tuple[int, bytes]]:
+    # Imported here to avoid a cycle, as ChordTransitioner consults the table
+    from satb_solver.chord_transitioner import ChordTransitioner
+    from satb_solver.template_parser import TemplateParser
+    from satb_solver.voicing_index import VoicingIndex
+
+    parser, transitioner = TemplateParser(), ChordTransitioner()
+    cur_chord_formula = next(parser.parse_template([cur_formula]))
+    next_chord_formulas = list(parser.parse_template(next_formulas))
+    pairs_by_semi = {pair.note_repr.semi_pos: pair
+                     for pair in cur_chord_formula.get_key_pos_pairs()}
+    if not TransitionTable.is_keyable(cur_chord_formula):
+        return []
+    voice_ranges = VoicesWithinRangeRule.get_voice_ranges(get_config()['voice_count'])
+    entries = []
+    for positions in VoicingIndex.get(cur_chord_formula).iter_voicings(voice_ranges):
+        cur_satb_chord = SATBChord(cur_chord_formula, [
+            NotePosPair(pairs_by_semi[pos % 12].scale_pos,
+                        Note(pairs_by_semi[pos % 12].note_repr, pos // 12))
+            for pos in positions
+        ])
+        for next_chord_formula in next_chord_formulas:
+            if not TransitionTable.is_keyable(next_chord_formula):
+                continue
+            payload = TransitionTable.encode_payload(*transitioner.search_optimal_transition(
+                cur_satb_chord, SATBChord(next_chord_formula, None)
+            ))
+            if payload is not None:
+                entries.append((
+                    TransitionTable.get_key_hash(cur_formula, positions,
+                                                 next_chord_formula.formula_name),
+                    payload
+                ))
+    return entries
+
+
+def build_transition_table(path: str, formulas: List[str], workers: int = 1) -> int:
+    """
+    Precomputes the optimal transitions from every in-range voicing of each formula to
+    each formula, with the current settings, and writes them as a TransitionTable.
+    """
+    jobs = [(formula, formulas) for formula in formulas]
+    if workers > 1:
+        from multiprocessing import Pool
+
+        with Pool(workers) as pool:
+            chunks = pool.starmap(_build_entries, jobs)
+    else:
+        chunks = [_build_entries(*job) for job in jobs]
+    entries = [entry for chunk in chunks for entry in chunk]
+    TransitionTable.write(path, entries)
+    return len(entries)
+
+
+@lru_cache(maxsize=4)
+def _open_transition_table(path: str) -> Optional[TransitionTable]:
+    # Resolved once per path, as tables are looked up for every transition
+    path = os.path.abspath(path)
+    if not os.path.exists(path):
+        return None
+    return TransitionTable(path)
+
+
+def get_transition_table() -> Optional[TransitionTable]:
+    path = get_config()['transition_table']
+    if path is None:
+        return None
+    table = _open_transition_table(path)
+    return table if table is not None and table.applies() else None
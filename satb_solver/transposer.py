@@ -0,0 +1,125 @@
+import re
+from typing import List, Optional, Tuple
+
+from model.chord_formulas import Chord
+from model.classifications import ACCSYM, NoteNameToScalePos, NoteNameToSemi
+from model.dt_def import NotePosPair
+from model.satb_elements import Note, SATBChord, SATBSequence
+from model.solver_config import get_config
+from model.transition_rules import VoicesWithinRangeRule
+from satb_solver.template_parser import TemplateParser
+
+
+class Transposer:
+    """
+    Transposes a solved progression into other keys. Every transition rule except the
+    voice ranges only depends on the intervals between notes, so the optimal sequences
+    of a transposed progression are the optimal sequences of the original shifted by
+    the same number of semitones, respelled in the new key. Only the voice ranges and
+    the spelling are redone per key.
+    """
+    # Tonic spelling used for each of the 12 keys
+    KEYS = ['C', 'Db', 'D', 'Eb', 'E', 'F', 'F#', 'G', 'Ab', 'A', 'Bb', 'B']
+    ROOT_MATCHER = re.compile(r'^([A-G])([b#])?(.*)$')
+
+    def __init__(self, template_parser: TemplateParser):
+        self.template_parser = template_parser
+
+    def _split_root(self, formula: str) -> Tuple[str, str, str]:
+        nat_note, accid, rest = self.ROOT_MATCHER.match(formula.strip()).groups()
+        return nat_note, accid or '', rest
+
+    def _is_spellable(self, formula: str) -> bool:
+        # Chord notes needing more than double accidentals are not spelled correctly
+        try:
+            chord_formula = self.template_parser.get_composition(formula)
+        except (AssertionError, KeyError, ValueError):
+            return False
+        base_semi = chord_formula.base_note.semi_pos
+        return all(
+            pair.note_repr.semi_pos == (base_semi + chord_formula.itvls[pair.scale_pos]) % 12
+            for pair in chord_formula.get_key_pos_pairs()
+        )
+
+    def _transpose_formula(self, formula: str, letter_shift: int, semi_shift: int) -> str:
+        nat_note, accid, rest = self._split_root(formula)
+        new_nat_note, nat_semi = NoteNameToScalePos.get_relative_scale_pos(
+            nat_note, letter_shift + 1
+        )
+        target_semi = (NoteNameToSemi.get(nat_note + accid) + semi_shift) % 12
+        change = (target_semi - nat_semi + 6) % 12 - 6
+        roots = [new_nat_note + ACCSYM.incr(ACCSYM.NAT, change)] if abs(change) <= 1 else []
+        # Otherwise respell the root enharmonically, as formula roots only take single
+        #  accidentals and their chord notes at most double ones
+        roots += sorted((note_name for note_name, semi in NoteNameToSemi.MAP.items()
+                         if semi == target_semi and len(note_name) <= 2),
+                        key=lambda note_name: (note_name not in self.KEYS, len(note_name)))
+        for root in roots:
+            if self._is_spellable(root + rest):
+                return root + rest
+        raise ValueError('Unable to spell {} transposed by {} semitones'.format(
+            formula, semi_shift
+        ))
+
+    def transpose_template(self, template: List[str], key: str) -> Tuple[List[str], int]:
+        """
+        Template moved so that its first chord's root is the given key, and the shift
+        in semitones (-5 to 6) that takes the original voicings to the new key.
+        """
+        first_nat, first_accid, _ = self._split_root(template[0])
+        letter_shift = (NoteNameToScalePos.ORDER.index(key[0]) -
+                        NoteNameToScalePos.ORDER.index(first_nat)) % 7
+        semi_shift = (NoteNameToSemi.get(key) - NoteNameToSemi.get(first_nat + first_accid)) % 12
+        transposed = [self._transpose_formula(formula, letter_shift, semi_shift)
+                      for formula in template]
+        return transposed, semi_shift if semi_shift <= 6 else semi_shift - 12
+
+    def _transpose_chord(self, satb_chord: SATBChord, chord_formula: Chord,
+                         shift: int) -> SATBChord:
+        pairs_by_scale_pos = {pair.scale_pos: pair for pair in chord_formula.get_key_pos_pairs()}
+        key_pos_pairs = []
+        for pair in satb_chord.key_pos_pairs:
+            abs_pos = pair.note_repr.abs_pos + shift
+            new_pair = pairs_by_scale_pos[pair.scale_pos]
+            assert new_pair.note_repr.semi_pos == abs_pos % 12, (
+                'Transposed {} does not match {}'.format(pair, chord_formula.formula_name)
+            )
+            key_pos_pairs.append(
+                NotePosPair(pair.scale_pos, Note(new_pair.note_repr, abs_pos // 12))
+            )
+        return SATBChord(chord_formula, key_pos_pairs)
+
+    def _is_within_ranges(self, satb_chord: SATBChord) -> bool:
+        voice_ranges = VoicesWithinRangeRule.get_voice_ranges(get_config()['voice_count'])
+        positions = sorted(pair.note_repr.abs_pos for pair in satb_chord.key_pos_pairs)
+        return all(VoicesWithinRangeRule._is_within_range(pos, voice_range)
+                   for pos, voice_range in zip(positions, voice_ranges))
+
+    def transpose_solutions(self, solution_seqs: List[SATBSequence], template: List[str],
+                            shift: int) -> Optional[List[SATBSequence]]:
+        """
+        The given solutions moved by shift semitones and spelled after the transposed
+        template, or None when a moved voicing leaves its voice's range, as other
+        voicings may then be optimal.
+        """
+        chord_seq = list(self.template_parser.parse_template(template))
+        res = []
+        for satb_seq in solution_seqs:
+            new_seq = SATBSequence()
+            for satb_chord, chord_formula in zip(satb_seq.sequence, chord_seq):
+                new_chord = self._transpose_chord(satb_chord, chord_formula, shift)
+                if not self._is_within_ranges(new_chord):
+                    return None
+                new_seq.add_satb_chord(new_chord, 0)
+            new_seq.seq_cost = satb_seq.seq_cost
+            new_seq.bounded = satb_seq.bounded
+            res.append(new_seq)
+        return res
+
+    def transpose_init_cond(self, init_chord: SATBChord, template: List[str],
+                            shift: int) -> str:
+        chord_formula = next(self.template_parser.parse_template(template[:1]))
+        new_chord = self._transpose_chord(init_chord, chord_formula, shift)
+        return ' '.join(pair.note_repr.note_name + str(pair.note_repr.octave)
+                        for pair in sorted(new_chord.key_pos_pairs,
+                                           key=lambda pair: pair.note_repr.abs_pos))
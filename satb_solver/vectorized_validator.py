@@ -0,0 +1,139 @@
+from functools import lru_cache
+from typing import List, Tuple
+
+from model.dt_def import MatchConfig, TransitionContext
+from model.solver_config import get_config
+from model.transition_rules import (AcceptableNoteFrequenciesRule,
+                                    DominantNotesResolvingRule, VoicePairTable,
+                                    VoicesWithinRangeRule)
+
+# NumPy takes longer to import than a short solve takes, so it is only imported
+#  once a validator is requested
+np = None
+
+
+class VectorizedConfigValidator:
+    """
+    Validates and costs a whole bucket of configurations at once. Configurations are
+    packed into (n_configs x n_voices) integer arrays and every rule used by
+    BFTransitionOptimizer._is_valid_config is evaluated as an array operation.
+    """
+    # Below this many configurations, packing costs more than it saves
+    MIN_BATCH = 64
+
+    def __init__(self, transition_context: TransitionContext):
+        self.transition_context = transition_context
+        self.voice_count = get_config()['voice_count']
+        self.freq_tol = AcceptableNoteFrequenciesRule.get_freq_tolerances(transition_context)
+        self.tols = dict(DominantNotesResolvingRule.SUS_TOL)
+        if DominantNotesResolvingRule.is_dominant(transition_context):
+            self.dom_tols = DominantNotesResolvingRule.DOM_TOL
+        else:
+            self.dom_tols = {}
+        voice_ranges = VoicesWithinRangeRule.get_voice_ranges(self.voice_count)
+        self.range_lo = np.array([low for low, _ in voice_ranges])
+        self.range_hi = np.array([high for _, high in voice_ranges])
+        self.lower_idx, self.upper_idx = np.triu_indices(self.voice_count, k=1)
+        self.valid_parallel = np.array(sorted(VoicePairTable.VALID_PARALLEL_INTERVALS))
+
+    @classmethod
+    def is_available(cls) -> bool:
+        global np
+        if np is None:
+            try:
+                import numpy
+            except ImportError:
+                return False
+            np = numpy
+        return True
+
+    def _pack(self, configs: List[MatchConfig]):
+        # Transitions are shared between configurations, so their attributes are
+        #  gathered once and configurations only store indices into them.
+        voices = None
+        trans_idxs, attrs, rows, full = {}, [], [], []
+        for config_idx, config in enumerate(configs):
+            if len(config.matchings) != self.voice_count:
+                continue
+            if voices is None:
+                voices = sorted(config.matchings)
+            row = []
+            for cur_abs_pos in voices:
+                trans = config.matchings[cur_abs_pos]
+                idx = trans_idxs.get(id(trans))
+                if idx is None:
+                    idx = trans_idxs[id(trans)] = len(attrs)
+                    attrs.append((trans.cur_abs_pos, trans.next_abs_pos, trans.cur_scale_pos,
+                                  trans.next_scale_pos, trans.min_diff))
+                row.append(idx)
+            rows.append(row)
+            full.append(config_idx)
+        if len(rows) == 0:
+            return None, full
+        attrs = np.array(attrs, dtype=np.int64)[np.array(rows, dtype=np.int64)]
+        return attrs.transpose(2, 0, 1), full
+
+    def _within_tolerances(self, cur, nxt, cur_scale, tols):
+        valid = np.ones(cur.shape[0], dtype=bool)
+        moves = nxt - cur
+        for scale_pos, tolerance_set in tols.items():
+            violating = (cur_scale == scale_pos) & ~np.isin(moves, list(tolerance_set))
+            valid &= ~violating.any(axis=1)
+        return valid
+
+    def evaluate(self, configs: List[MatchConfig]) -> Tuple:
+        """
+        Returns a boolean mask of valid configurations and their costs, in the order
+        of the given configurations.
+        """
+        mask = np.zeros(len(configs), dtype=bool)
+        costs = np.zeros(len(configs), dtype=np.int64)
+        packed, full = self._pack(configs)
+        if packed is None:
+            return mask, costs
+        cur, nxt, cur_scale, next_scale, min_diff = packed
+
+        # AcceptableNoteFrequenciesRule
+        valid = np.ones(cur.shape[0], dtype=bool)
+        for pos, freq_range in self.freq_tol.items():
+            counts = (next_scale == pos).sum(axis=1)
+            valid &= (counts >= freq_range.min_freq) & (counts <= freq_range.max_freq)
+        # ValidVoicePairsRule (parallel intervals between all pairs, spacing between
+        #  adjacent voices)
+        before = cur[:, self.upper_idx] - cur[:, self.lower_idx]
+        after = nxt[:, self.upper_idx] - nxt[:, self.lower_idx]
+        parallel = (
+            (after % 12 == before % 12) & ~np.isin(after, self.valid_parallel) &
+            (cur[:, self.lower_idx] != nxt[:, self.lower_idx])
+        )
+        valid &= ~parallel.any(axis=1)
+        gaps = np.diff(nxt, axis=1)
+        valid &= ((gaps > 0) & (gaps <= 12)).all(axis=1)
+        # DominantNotesResolvingRule
+        valid &= self._within_tolerances(cur, nxt, cur_scale, self.dom_tols)
+        valid &= self._within_tolerances(cur, nxt, cur_scale, self.tols)
+        # VoicesWithinRangeRule
+        valid &= ((nxt >= self.range_lo) & (nxt <= self.range_hi)).all(axis=1)
+
+        full = np.array(full)
+        mask[full] = valid
+        costs[full] = np.where(min_diff == -1, np.abs(nxt - cur), min_diff).sum(axis=1)
+        return mask, costs
+
+
+@lru_cache(maxsize=1)
+def _warn_unavailable():
+    import logging
+
+    logging.getLogger('vectorized_validator').warning(
+        'NumPy is not installed, falling back to per-configuration validation'
+    )
+
+
+def get_vectorized_validator(transition_context: TransitionContext):
+    if not get_config()['vectorized']:
+        return None
+    if not VectorizedConfigValidator.is_available():
+        _warn_unavailable()
+        return None
+    return VectorizedConfigValidator(transition_context)
@@ -0,0 +1,201 @@
+from typing import Dict, Iterator, List, Optional, Set, Tuple
+
+from model.chord_formulas import Chord
+from model.dt_def import FreqRange
+from model.solver_config import get_config
+
+
+class VoicingIndex:
+    """
+    Every voicing of a chord formula that has no crossing voices, no adjacent voices
+    more than an octave apart, acceptable note frequencies and (with include_inv)
+    the inversion's base note in the bass. Voicings only differ by the bass position,
+    so they are stored once, relative to the bass, as a trie of semitone offsets from
+    the bass: each level of the trie is the next voice up.
+    """
+    _cache = {}
+
+    def __init__(self, chord_formula: Chord, voice_count: int, include_inv: bool,
+                 build: bool = True):
+        self.voice_count = voice_count
+        self.scale_pos_by_semi = {}
+        # Sorted, so that voicings are listed in the same order in every run
+        for pair in sorted(chord_formula.get_key_pos_pairs(),
+                           key=lambda pair: (pair.note_repr.semi_pos, pair.scale_pos)):
+            self.scale_pos_by_semi.setdefault(pair.note_repr.semi_pos, []).append(pair.scale_pos)
+        self.freq_tol = self._get_permissive_freqs(chord_formula)
+        # Enharmonically equal chord notes make frequencies ambiguous per semitone,
+        #  so they are left to the transition rules
+        self.check_freqs = all(len(poss) == 1 for poss in self.scale_pos_by_semi.values())
+        if include_inv:
+            self.bass_semis = [chord_formula.get_base_with_inv().semi_pos]
+        else:
+            self.bass_semis = list(self.scale_pos_by_semi)
+        self.tries = {}
+        if not build:
+            return
+        for bass_semi in self.bass_semis:
+            counts = {scale_pos: 0 for scale_pos in self.freq_tol}
+            self._count(bass_semi, counts, 1)
+            self.tries[bass_semi] = self._build_trie(bass_semi, 0, 1, counts)
+            self._count(bass_semi, counts, -1)
+
+    def _get_permissive_freqs(self, chord_formula: Chord) -> Dict[int, FreqRange]:
+        # Whether the dominant-to-tonic exception applies depends on the previous
+        #  chord, so the index allows the frequencies of both cases
+        freqs = chord_formula.get_note_freqs()
+        if not hasattr(chord_formula, 'CAD_ESSENTIAL'):
+            return freqs
+        exc_freqs = chord_formula.get_note_freqs(exc=True)
+        return {pos: FreqRange(min(freq.min_freq, exc_freqs[pos].min_freq),
+                               max(freq.max_freq, exc_freqs[pos].max_freq))
+                for pos, freq in freqs.items()}
+
+    def _count(self, semi: int, counts: Dict[int, int], amt: int) -> None:
+        for scale_pos in self.scale_pos_by_semi[semi]:
+            counts[scale_pos] += amt
+
+    def _is_countable(self, semi: int, counts: Dict[int, int], placed: int) -> bool:
+        if not self.check_freqs:
+            return True
+        scale_pos = self.scale_pos_by_semi[semi][0]
+        if counts[scale_pos] >= self.freq_tol[scale_pos].max_freq:
+            return False
+        # The voices left after this one must still be able to cover every missing note
+        missing = sum(max(0, freq.min_freq - counts[pos] - (pos == scale_pos))
+                      for pos, freq in self.freq_tol.items())
+        return missing <= self.voice_count - placed - 1
+
+    def _has_valid_freqs(self, counts: Dict[int, int]) -> bool:
+        return not self.check_freqs or all(
+            freq.min_freq <= counts[pos] <= freq.max_freq for pos, freq in self.freq_tol.items()
+        )
+
+    def _build_trie(self, bass_semi: int, offset: int, placed: int,
+                    counts: Dict[int, int]) -> Dict:
+        if placed == self.voice_count:
+            return {} if self._has_valid_freqs(counts) else None
+        trie = {}
+        for gap in range(1, 13):
+            semi = (bass_semi + offset + gap) % 12
+            if semi not in self.scale_pos_by_semi or not self._is_countable(semi, counts, placed):
+                continue
+            self._count(semi, counts, 1)
+            subtrie = self._build_trie(bass_semi, offset + gap, placed + 1, counts)
+            self._count(semi, counts, -1)
+            if subtrie is not None:
+                trie[offset + gap] = subtrie
+        return trie or None
+
+    def _has_completion(self, pos: int, placed: int, counts: Dict[int, int],
+                        dead_ends: Set[Tuple],
+                        voice_ranges: Optional[List[Tuple[int, int]]] = None) -> bool:
+        # Whether the voices above a voice at the given position can be completed.
+        #  Without voice ranges only the semitone, not the position, matters for what
+        #  can follow, so positions are semitones. States already known to fail are
+        #  not searched again.
+        if placed == self.voice_count:
+            return self._has_valid_freqs(counts)
+        state = (pos, placed, tuple(counts.values()))
+        if state in dead_ends:
+            return False
+        for gap in range(1, 13):
+            next_semi = (pos + gap) % 12
+            if (
+                next_semi not in self.scale_pos_by_semi or
+                not self._is_countable(next_semi, counts, placed)
+            ):
+                continue
+            if voice_ranges is None:
+                next_pos = next_semi
+            else:
+                next_pos = pos + gap
+                low, high = voice_ranges[placed]
+                if not low <= next_pos <= high:
+                    continue
+            self._count(next_semi, counts, 1)
+            found = self._has_completion(next_pos, placed + 1, counts, dead_ends, voice_ranges)
+            self._count(next_semi, counts, -1)
+            if found:
+                return True
+        dead_ends.add(state)
+        return False
+
+    def has_voicing(self, voice_ranges: Optional[List[Tuple[int, int]]] = None) -> bool:
+        """
+        Whether the chord has any voicing, with each voice within the given (low, high)
+        absolute position range if any. Stops at the first one found, so it does not
+        need the tries to be built.
+        """
+        if len(self.tries) > 0 and voice_ranges is None:
+            return any(trie is not None for trie in self.tries.values())
+        counts = {scale_pos: 0 for scale_pos in self.freq_tol}
+        dead_ends = set()
+        for bass_semi in self.bass_semis:
+            if voice_ranges is None:
+                basses = [bass_semi]
+            else:
+                low, high = voice_ranges[0]
+                basses = range(low + (bass_semi - low) % 12, high + 1, 12)
+            self._count(bass_semi, counts, 1)
+            found = any(self._has_completion(bass, 1, counts, dead_ends, voice_ranges)
+                        for bass in basses)
+            self._count(bass_semi, counts, -1)
+            if found:
+                return True
+        return False
+
+    def get_trie(self, bass_semi: int) -> Dict:
+        return self.tries.get(bass_semi)
+
+    def iter_voicings(self, voice_ranges: List[Tuple[int, int]]) -> Iterator[Tuple[int, ...]]:
+        """
+        Absolute positions (lowest voice first) of every voicing with each voice
+        within the given (low, high) absolute position range.
+        """
+        def walk(trie, bass, positions):
+            if len(positions) == self.voice_count:
+                yield tuple(positions)
+                return
+            low, high = voice_ranges[len(positions)]
+            for offset, subtrie in trie.items():
+                if low <= bass + offset <= high:
+                    yield from walk(subtrie, bass, positions + [bass + offset])
+
+        low, high = voice_ranges[0]
+        for bass_semi, trie in self.tries.items():
+            if trie is None:
+                continue
+            for bass in range(low + (bass_semi - low) % 12, high + 1, 12):
+                yield from walk(trie, bass, [bass])
+
+    @classmethod
+    def _get_key(cls, chord_formula: Chord) -> Tuple:
+        return (
+            type(chord_formula).__name__, chord_formula.base_note.note_name,
+            chord_formula.inversion, tuple(sorted(chord_formula.itvls.items())),
+            tuple(sorted(chord_formula.base_ess)),
+            get_config()['voice_count'], get_config()['include_inv']
+        )
+
+    @classmethod
+    def exists(cls, chord_formula: Chord,
+               voice_ranges: Optional[List[Tuple[int, int]]] = None) -> bool:
+        """
+        Whether a chord formula has any voicing, within the given voice ranges if any,
+        without building its index.
+        """
+        index = cls._cache.get(cls._get_key(chord_formula))
+        if index is None:
+            index = cls(chord_formula, get_config()['voice_count'], get_config()['include_inv'],
+                        build=False)
+        return index.has_voicing(voice_ranges)
+
+    @classmethod
+    def get(cls, chord_formula: Chord) -> 'VoicingIndex':
+        key = cls._get_key(chord_formula)
+        index = cls._cache.get(key)
+        if index is None:
+            index = cls._cache[key] = cls(chord_formula, get_config()['voice_count'],
+                                          get_config()['include_inv'])
+        return index
@@ -1,21 +1,57 @@
 import argparse
+import sys
 from time import time
 
+from model.solver_config import parse_config_overrides, set_config_overrides
 from satb_solver.satb import SATBSolver
+from satb_solver.solution_writer import SolutionWriter
 
 
 def parse_args():
     parser = argparse.ArgumentParser(description='Solve SATB harmony')
     parser.add_argument('filepath', type=str, nargs=1,
                         help='Absolute path to file with template harmonies')
-    args = parser.parse_args()
-    return args.filepath[0]
+    parser.add_argument('-s', '--set', type=str, action='append', default=[],
+                        metavar='SETTING=VALUE', dest='settings',
+                        help='Override a setting of solver_config.yaml (repeatable)')
+    parser.add_argument('-o', '--output', type=str, default=None,
+                        help='Write solutions to this file ("-" for stdout) instead of '
+                             'reporting them in the terminal')
+    parser.add_argument('-f', '--format', type=str, default=None,
+                        choices=SolutionWriter.FORMATS,
+                        help='Format of --output (default: from its extension, else jsonl)')
+    parser.add_argument('--stream', action='store_true',
+                        help='Write each progression to --output as soon as it is solved')
+    parser.add_argument('--batch', type=int, default=1,
+                        help='Solve this many progressions at a time, sharing the work of '
+                             'common openings')
+    parser.add_argument('--all-keys', action='store_true',
+                        help='Solve each progression in all 12 keys')
+    parser.add_argument('--stats', action='store_true',
+                        help='Report rule ordering and result cache statistics on stderr '
+                             'after solving')
+    return parser.parse_args()
 
 
 if __name__ == '__main__':
-    source_filepath = parse_args()
-    solver = SATBSolver(source_filepath)
+    args = parse_args()
+    set_config_overrides(**parse_config_overrides(args.settings))
+    solver = SATBSolver(args.filepath[0])
     t0 = time()
-    solver.solve()
-    print()
-    print('Solutions generated in: {} sec'.format(round(time() - t0, 5)))
+    if args.output is None:
+        failures = solver.solve(batch_size=args.batch, all_keys=args.all_keys)
+        print()
+        print('Solutions generated in: {} sec'.format(round(time() - t0, 5)))
+    else:
+        with SolutionWriter(args.output, args.format, args.stream) as writer:
+            failures = solver.solve(writer, args.batch, args.all_keys)
+    if args.stats:
+        print(solver.chord_transitioner.rule_order.format_stats(), file=sys.stderr)
+        if solver.result_cache is not None:
+            print('Result cache: {hits} hits, {coalesced} coalesced, {misses} misses, '
+                  '{entries} entries'.format(**solver.result_cache.get_stats()), file=sys.stderr)
+    if failures > 0:
+        print('{} progression{} could not be solved'.format(
+            failures, '' if failures == 1 else 's'
+        ), file=sys.stderr)
+        sys.exit(1)
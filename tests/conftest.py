@@ -0,0 +1,55 @@
+import os
+import sys
+from typing import Dict, List, Tuple
+
+import pytest
+
+# The solver is run from the repository root rather than installed
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from model.satb_elements import SATBChord, SATBSequence  # noqa: E402
+from satb_solver.chord_transitioner import ChordTransitioner  # noqa: E402
+from satb_solver.template_parser import TemplateParser  # noqa: E402
+
+# Initial condition and formulas of progressions every test may solve, by voice count
+PROGRESSIONS = {
+    4: [
+        ('C3 G3 E4 C5', ['Cmaj', 'Fmaj', 'Gmaj', 'Amin', 'Dmin7', 'G7', 'Cmaj']),
+        ('C3 G3 E4 C5', ['Cmaj', 'Fmaj_64', 'Dmin7_42', 'Ebmaj7_43', 'Bb7', 'Baug',
+                         'Abmin7-b5_42', 'Dmin_6', 'Ebdim7', 'Abmaj7-#3_43', 'Gmaj-sus', 'G13',
+                         'Cmaj']),
+    ],
+    5: [
+        ('C3 E3 C4 G4 E5', ['Cmaj', 'Dmin7_42', 'G7_65', 'Amin_6', 'Fmaj_64', 'Cmaj7-#5',
+                            'Ab7_65', 'Bbmin_6', 'G7_43', 'Cmaj']),
+    ],
+}
+
+
+def get_note_names(satb_chord: SATBChord) -> List[str]:
+    return [note.note_name + str(note.octave) for note in satb_chord._key()]
+
+
+def get_solution_keys(solutions: List[SATBSequence]) -> List[Tuple]:
+    # Solutions compared by cost and notes, in an order that does not depend on hashing
+    return sorted((solution.seq_cost,
+                   [get_note_names(satb_chord) for satb_chord in solution.sequence])
+                  for solution in solutions)
+
+
+@pytest.fixture
+def template_parser() -> TemplateParser:
+    return TemplateParser()
+
+
+@pytest.fixture
+def solve(template_parser):
+    """
+    Solves a progression with a new ChordTransitioner under the active settings.
+    """
+    def solve(init_cond: str, formulas: List[str], pins: Dict[int, List[str]] = None,
+              transitioner: ChordTransitioner = None) -> List[SATBSequence]:
+        transitioner = transitioner or ChordTransitioner()
+        return transitioner.transition_chords(list(template_parser.parse_template(formulas)),
+                                              init_cond.split(), pins)
+    return solve
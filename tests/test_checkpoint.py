@@ -0,0 +1,62 @@
+import os
+
+import pytest
+
+from conftest import PROGRESSIONS, get_solution_keys
+from model.solver_config import config_overrides
+from satb_solver.chord_transitioner import ChordTransitioner
+
+INIT_COND, FORMULAS = PROGRESSIONS[4][1]
+
+
+class Interrupted(Exception):
+    pass
+
+
+def interrupt_after(monkeypatch, steps: int) -> list:
+    # Counts the frontiers computed, and stops the solve once the given number is reached
+    advances = []
+    advance_frontier = ChordTransitioner._advance_frontier
+
+    def advance(self, *args, **kwargs):
+        if len(advances) == steps:
+            raise Interrupted()
+        advances.append(args)
+        return advance_frontier(self, *args, **kwargs)
+
+    monkeypatch.setattr(ChordTransitioner, '_advance_frontier', advance)
+    return advances
+
+
+def test_resume_after_interruption(solve, monkeypatch, tmp_path):
+    expected = get_solution_keys(solve(INIT_COND, FORMULAS))
+    with config_overrides(checkpoint_dir=str(tmp_path), checkpoint_interval=1):
+        interrupt_after(monkeypatch, 5)
+        with pytest.raises(Interrupted):
+            solve(INIT_COND, FORMULAS)
+        assert len(os.listdir(tmp_path)) == 1
+        monkeypatch.undo()
+
+        # The saved frontiers are loaded, and only the remaining steps are solved
+        advances = interrupt_after(monkeypatch, len(FORMULAS))
+        assert get_solution_keys(solve(INIT_COND, FORMULAS)) == expected
+        assert len(advances) == len(FORMULAS) - 1 - 5
+    # A finished solve removes its checkpoint
+    assert os.listdir(tmp_path) == []
+
+
+def test_resume_discards_partial_frontier(solve, monkeypatch, tmp_path):
+    expected = get_solution_keys(solve(INIT_COND, FORMULAS))
+    with config_overrides(checkpoint_dir=str(tmp_path), checkpoint_interval=1):
+        interrupt_after(monkeypatch, 5)
+        with pytest.raises(Interrupted):
+            solve(INIT_COND, FORMULAS)
+        monkeypatch.undo()
+        # A frontier cut short by the interruption is solved again
+        path = os.path.join(tmp_path, os.listdir(tmp_path)[0])
+        with open(path, 'rb+') as cf:
+            cf.truncate(os.path.getsize(path) - 10)
+
+        advances = interrupt_after(monkeypatch, len(FORMULAS))
+        assert get_solution_keys(solve(INIT_COND, FORMULAS)) == expected
+        assert len(advances) == len(FORMULAS) - 1 - 4
@@ -0,0 +1,27 @@
+import pytest
+
+from conftest import PROGRESSIONS, get_solution_keys
+from model.solver_config import config_overrides
+
+# Settings that change how transitions are searched, but never which are optimal
+ENGINE_SETTINGS = [
+    {'engine': 'bnb'},
+    {'engine': 'indexed'},
+    {'engine': 'bf', 'vectorized': True},
+    {'engine': 'bf', 'adaptive_rules': False},
+]
+
+
+@pytest.mark.parametrize('voice_count,init_cond,formulas', [
+    (voice_count, init_cond, formulas)
+    for voice_count, progressions in PROGRESSIONS.items()
+    for init_cond, formulas in progressions
+])
+@pytest.mark.parametrize('include_inv', [True, False])
+def test_engines_match_bf(solve, voice_count, init_cond, formulas, include_inv):
+    with config_overrides(voice_count=voice_count, include_inv=include_inv, engine='bf'):
+        expected = get_solution_keys(solve(init_cond, formulas))
+        assert len(expected) > 0
+        for settings in ENGINE_SETTINGS:
+            with config_overrides(**settings):
+                assert get_solution_keys(solve(init_cond, formulas)) == expected, settings
@@ -0,0 +1,25 @@
+import pytest
+
+from conftest import PROGRESSIONS, get_solution_keys
+from model.solver_config import config_overrides
+
+
+@pytest.mark.parametrize('voice_count,init_cond,formulas', [
+    (4, *PROGRESSIONS[4][1]),
+    (5, *PROGRESSIONS[5][0]),
+])
+@pytest.mark.parametrize('segment_workers', [1, 2])
+def test_pinned_solutions_pass_through_pins(solve, voice_count, init_cond, formulas,
+                                            segment_workers):
+    with config_overrides(voice_count=voice_count):
+        unpinned = get_solution_keys(solve(init_cond, formulas))
+        # Pinning voicings of an optimal solution keeps exactly the optimal solutions
+        #  through them
+        steps = [len(formulas) // 3, 2 * len(formulas) // 3, len(formulas) - 1]
+        pins = {step: unpinned[-1][1][step] for step in steps}
+        expected = [(cost, chords) for cost, chords in unpinned
+                    if all(chords[step] == notes for step, notes in pins.items())]
+        with config_overrides(segment_workers=segment_workers):
+            pinned = get_solution_keys(solve(init_cond, formulas, pins))
+    assert pinned == expected
+
@@ -0,0 +1,26 @@
+from conftest import PROGRESSIONS, get_solution_keys
+from model.solver_config import config_overrides
+from satb_solver.search_trace import TraceReplay
+
+
+def test_replay_regenerates_solutions(solve, tmp_path):
+    path = str(tmp_path / 'trace.jsonl')
+    with config_overrides(trace_path=path):
+        solved = [(formulas, solve(init_cond, formulas))
+                  for init_cond, formulas in PROGRESSIONS[4]]
+
+    replay = TraceReplay(path)
+    assert len(replay.solves) == len(solved)
+    assert len(replay.transitions) > 0
+    assert all('ns' in transition for transition in replay.transitions)
+    for solve_event, (formulas, solutions) in zip(replay.solves, solved):
+        assert solve_event['formulas'] == formulas
+        sequences = TraceReplay.get_optimal_sequences(solve_event['frontiers'], len(solutions) + 1)
+        replayed = sorted((cost, chords) for chords, cost in sequences)
+        assert replayed == get_solution_keys(solutions)
+    # Both reports cover every recorded search and solve
+    summary = replay.format_summary(5)
+    assert summary.startswith('{} transition searches, {} solves'.format(
+        len(replay.transitions), len(solved)
+    ))
+    assert len(replay.format_solves(1).splitlines()) == 2 * len(solved)
@@ -0,0 +1,23 @@
+import pytest
+
+from conftest import PROGRESSIONS, get_solution_keys
+from model.solver_config import config_overrides
+from satb_solver.satb import SATBSolver
+from satb_solver.transposer import Transposer
+
+
+@pytest.mark.parametrize('voice_count,init_cond,formulas', [
+    (4, *PROGRESSIONS[4][0]),
+    (5, *PROGRESSIONS[5][0]),
+])
+def test_all_keys_match_independent_solves(solve, tmp_path, voice_count, init_cond, formulas):
+    source = tmp_path / 'progression.txt'
+    source.write_text('\n'.join([init_cond] + formulas) + '\n')
+    with config_overrides(voice_count=voice_count):
+        results = list(SATBSolver(str(source)).iter_solutions(all_keys=True))
+        assert len(results) == len(Transposer.KEYS)
+        for key, (progression, solutions, error) in zip(Transposer.KEYS, results):
+            assert error is None, key
+            assert progression.template[0].startswith(key)
+            expected = solve(progression.init_cond, progression.template)
+            assert get_solution_keys(solutions) == get_solution_keys(expected), key